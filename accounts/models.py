@@ -77,6 +77,12 @@ class PasswordResetOTP(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     attempts = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # OTP rate limit / lookup: filter(email=..., created_at__gte=...)
+            models.Index(fields=["email", "created_at"], name="otp_email_created_idx"),
+        ]
+
     def is_expired(self):
         return timezone.now() > self.created_at + timedelta(minutes=5)  # ✅ FIXED
 
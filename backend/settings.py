@@ -113,6 +113,25 @@ else:
         }
     }
 
+# -------------------------------------------------
+# CACHE
+# -------------------------------------------------
+# Shared Redis cache when REDIS_URL is set (needed for cross-worker
+# invalidation); per-process memory cache otherwise.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 # -------------------------------------------------
 # AUTH
 # -------------------------------------------------
@@ -169,8 +188,77 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson-backed, same bytes as rest_framework.renderers.JSONRenderer
+    'DEFAULT_RENDERER_CLASSES': (
+        'products.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        # Accept: application/msgpack (mobile app)
+        'products.renderers.MessagePackRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'products.parsers.MessagePackParser',
+    ),
 }
 
+# Product listings: ?cursor= / ?page_size= keyset pagination
+PRODUCT_PAGE_SIZE = 24
+PRODUCT_MAX_PAGE_SIZE = 100
+
+# Bulk product lookup: max ids per request
+PRODUCT_BATCH_MAX_IDS = 250
+
+# Batch cart endpoint: max add / set / remove operations per request
+CART_BATCH_MAX_OPERATIONS = 100
+# ...and the largest quantity it may leave on one cart line
+CART_MAX_LINE_QUANTITY = 999
+
+# Guest carts: "deferred" keeps an empty anonymous cart in the cart_code
+# cookie only and writes the Cart row on the first add; "database"
+# creates a row on every get_cart without a cart_code
+GUEST_CART_STORAGE = "deferred"
+
+# purge_stale_data: retention per kind of row, rows deleted per transaction
+GUEST_CART_RETENTION_DAYS = 30
+PAID_CART_RETENTION_DAYS = 7
+PASSWORD_RESET_OTP_RETENTION_HOURS = 24
+PURGE_BATCH_SIZE = 1000
+
+# Cart badge summary cache (seconds); cart writes and product saves invalidate it
+CART_SUMMARY_TIMEOUT = 300
+
+# ?facets= price histogram bucket upper bounds (last bucket is open-ended)
+PRODUCT_PRICE_BUCKETS = (500, 1000, 2000, 5000)
+
+# Autocomplete prefix index: rebuild at most this stale (per process)
+AUTOCOMPLETE_REFRESH_SECONDS = 300
+
+# Cached ProductSerializer documents (keyed by updated_at, so edits never read a stale one)
+PRODUCT_DOCUMENT_TIMEOUT = 3600
+
+# Trending ranking (manage.py update_trending_scores, run on a schedule)
+TRENDING_HALF_LIFE_HOURS = 72
+TRENDING_WEIGHTS = {"order_item": 3.0, "wishlist": 2.0, "cart_item": 1.0}
+TRENDING_MIN_SCORE = 0.01
+TRENDING_LIMIT = 50
+# Only events older than this advance the high-water marks (late commits)
+TRENDING_GRACE_SECONDS = 300
+
+# Frequently bought together: neighbours kept per product (manage.py rebuild_cooccurrence)
+COOCCURRENCE_TOP_K = 20
+
+# Similar products (manage.py rebuild_similar_products --if-changed, scheduled)
+SIMILAR_PRODUCTS_TOP_K = 12
+SIMILAR_PRODUCTS_BLOCK = 1024
+
+# Resized image derivatives (srcset), built by a background thread pool
+IMAGE_VARIANT_WIDTHS = (320, 640, 1024)
+IMAGE_VARIANT_FORMATS = ("webp", "jpeg")
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = 2
+
 # -------------------------------------------------
 # JWT
 # -------------------------------------------------
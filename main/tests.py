@@ -1,3 +1,27 @@
-from django.test import TestCase
+from accounts.models import PasswordResetOTP, ServiceArea
+from products.tests import QueryPlanTestCase
 
-# Create your tests here.
+
+class AccountQueryPlanTests(QueryPlanTestCase):
+
+    @classmethod
+    def seed(cls):
+        PasswordResetOTP.objects.bulk_create(
+            PasswordResetOTP(email=f"user{i % 2000}@example.com", otp="123456") for i in range(5000)
+        )
+        ServiceArea.objects.bulk_create(
+            ServiceArea(city=f"City {i % 50}", pincode=str(400000 + i), is_active=i % 4 != 0)
+            for i in range(5000)
+        )
+
+    def test_otp_rate_limit(self):
+        recent = PasswordResetOTP.objects.order_by("created_at")[2500].created_at
+        self.assertUsesIndexes(
+            PasswordResetOTP.objects.filter(email="user7@example.com", created_at__gte=recent)
+        )
+
+    def test_otp_lookup(self):
+        self.assertUsesIndexes(PasswordResetOTP.objects.filter(email="user7@example.com"))
+
+    def test_service_area(self):
+        self.assertUsesIndexes(ServiceArea.objects.filter(pincode="401234", is_active=True))
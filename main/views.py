@@ -23,7 +23,7 @@ from .serializers import (
     OTPVerifySerializer,
     ResetPasswordSerializer,UserAddressSerializer
 )
-from products.views import merge_guest_cart
+from products.carts import merge_guest_cart
 from django.contrib.auth import get_user_model
 User = get_user_model()
 
@@ -61,6 +61,10 @@ class CartAdmin(ImportExportModelAdmin):
         return obj.user.email if obj.user else "Guest Cart"
     get_user_email.short_description = "User Email"
 
+    # ✅ Totals come from one annotated query for the whole page
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("user").with_totals()
+
 
 # ================================
 # 🧾 CART ITEM ADMIN
@@ -0,0 +1,196 @@
+"""
+In-process prefix index for search-as-you-type suggestions.
+
+Every product name, brand and category name is stored in a sorted list
+of (term, kind, key) tuples, one term per word position ("red running
+shoe" is findable by "red", "run" and "sho"). A lookup is a bisect to
+the first term >= prefix followed by a short forward scan, so it never
+touches the database.
+
+The index is built on first use and kept current by the post_save /
+post_delete receivers in products/signals.py. Those only fire in the
+process that made the change, so each process also rebuilds the index
+after AUTOCOMPLETE_REFRESH_SECONDS to pick up edits made elsewhere. That
+rebuild runs in one background thread; lookups keep answering from the
+current index meanwhile.
+"""
+import logging
+import threading
+import time
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.db import connection
+
+
+logger = logging.getLogger(__name__)
+
+
+# Upper bound on terms examined per lookup, so one-letter prefixes stay cheap
+MAX_SCAN = 2000
+
+
+def normalize(text):
+    return " ".join((text or "").lower().split())
+
+
+def word_suffixes(text):
+    """'Red Running Shoe' → ['red running shoe', 'running shoe', 'shoe']"""
+    words = normalize(text).split(" ")
+    return [" ".join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+    KINDS = ("products", "brands", "categories")
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._building = threading.Lock()  # held while a build runs
+        self._terms = []          # sorted [(term, kind, key)]
+        self._payloads = {}       # (kind, key) → dict returned to clients
+        self._owned_terms = {}    # (kind, key) → [(term, kind, key)]
+        self._brand_refs = {}     # brand key → number of products using it
+        self._product_brands = {} # product id → brand key
+        self.built_at = None
+
+    # ------------------------
+    # Building
+    # ------------------------
+    def build(self):
+        from .models import Category, Product
+
+        fresh = PrefixIndex()
+        for product in Product.objects.values("id", "name", "slug", "brand"):
+            fresh._add_product(product, sort=False)
+        for category in Category.objects.values("id", "name", "slug"):
+            fresh._add(("categories", category["id"]), category["name"], category, sort=False)
+        fresh._terms.sort()
+
+        with self._lock:
+            self.__dict__.update(
+                {k: v for k, v in fresh.__dict__.items() if k not in ("_lock", "_building")}
+            )
+            self.built_at = time.monotonic()
+
+    def ensure_built(self):
+        """
+        Build on first use (the only time a lookup waits); once stale,
+        start a background rebuild unless one is already running.
+        """
+        if self.built_at is None:
+            with self._building:
+                if self.built_at is None:
+                    self.build()
+            return
+
+        max_age = getattr(settings, "AUTOCOMPLETE_REFRESH_SECONDS", 300)
+        if time.monotonic() - self.built_at > max_age and self._building.acquire(blocking=False):
+            threading.Thread(target=self._refresh, name="autocomplete-refresh", daemon=True).start()
+
+    def _refresh(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception("Autocomplete index refresh failed")
+            self.built_at = time.monotonic()  # retry after another interval
+        finally:
+            self._building.release()
+            connection.close()
+
+    # ------------------------
+    # Incremental updates
+    # ------------------------
+    def _add(self, owner, text, payload, sort=True):
+        terms = [(term, owner[0], owner[1]) for term in word_suffixes(text)]
+        self._payloads[owner] = payload
+        self._owned_terms[owner] = terms
+        for entry in terms:
+            if sort:
+                insort(self._terms, entry)
+            else:
+                self._terms.append(entry)
+
+    def _remove(self, owner):
+        self._payloads.pop(owner, None)
+        for entry in self._owned_terms.pop(owner, []):
+            position = bisect_left(self._terms, entry)
+            if position < len(self._terms) and self._terms[position] == entry:
+                del self._terms[position]
+
+    def _add_product(self, product, sort=True):
+        payload = {"id": product["id"], "name": product["name"], "slug": product["slug"]}
+        self._add(("products", product["id"]), product["name"], payload, sort=sort)
+
+        brand_key = normalize(product.get("brand"))
+        if brand_key:
+            self._product_brands[product["id"]] = brand_key
+            self._brand_refs[brand_key] = self._brand_refs.get(brand_key, 0) + 1
+            if self._brand_refs[brand_key] == 1:
+                self._add(("brands", brand_key), product["brand"], {"name": product["brand"]}, sort=sort)
+
+    def _remove_product(self, product_id):
+        self._remove(("products", product_id))
+
+        brand_key = self._product_brands.pop(product_id, None)
+        if brand_key:
+            self._brand_refs[brand_key] -= 1
+            if not self._brand_refs[brand_key]:
+                del self._brand_refs[brand_key]
+                self._remove(("brands", brand_key))
+
+    def update_product(self, product):
+        if self.built_at is None:
+            return
+        with self._lock:
+            self._remove_product(product.pk)
+            self._add_product({"id": product.pk, "name": product.name, "slug": product.slug, "brand": product.brand})
+
+    def remove_product(self, product_id):
+        if self.built_at is None:
+            return
+        with self._lock:
+            self._remove_product(product_id)
+
+    def update_category(self, category):
+        if self.built_at is None:
+            return
+        with self._lock:
+            owner = ("categories", category.pk)
+            self._remove(owner)
+            self._add(owner, category.name, {"id": category.pk, "name": category.name, "slug": category.slug})
+
+    def remove_category(self, category_id):
+        if self.built_at is None:
+            return
+        with self._lock:
+            self._remove(("categories", category_id))
+
+    # ------------------------
+    # Lookup
+    # ------------------------
+    def suggest(self, prefix, limit=5):
+        self.ensure_built()
+        prefix = normalize(prefix)
+        results = {kind: [] for kind in self.KINDS}
+        if not prefix:
+            return results
+
+        seen = set()
+        with self._lock:
+            position = bisect_left(self._terms, (prefix,))
+            end = min(len(self._terms), position + MAX_SCAN)
+            while position < end:
+                term, kind, key = self._terms[position]
+                if not term.startswith(prefix):
+                    break
+                position += 1
+                if (kind, key) in seen or len(results[kind]) >= limit:
+                    continue
+                seen.add((kind, key))
+                results[kind].append(self._payloads[(kind, key)])
+                if all(len(found) >= limit for found in results.values()):
+                    break
+        return results
+
+
+index = PrefixIndex()
@@ -0,0 +1,296 @@
+"""
+Cart writes that stay correct under concurrent requests.
+
+``add_to_cart()`` is a single INSERT ... ON CONFLICT (cart, product, size)
+DO UPDATE statement: the database either creates the line or adds to its
+quantity under the row lock, so two taps at once can neither lose an
+increment nor trip the unique constraint. Sizes are stored as "" rather
+than NULL so the constraint covers size-less products too.
+
+``parse_operations()`` and ``apply_operations()`` back the batch
+endpoint: a list of add / set / remove operations is folded into one
+final change per line and the products are checked with one query
+before any cart is touched; the adds, sets and removes are then each a
+single statement inside one transaction.
+
+``merge_guest_cart()`` runs at login: the guest cart's lines are
+upserted into the user's open cart with one INSERT ... SELECT (summing
+quantities per product and size) and the guest cart is deleted, all in
+one transaction, so a failure leaves both carts untouched.
+
+Guest carts are deferred (GUEST_CART_STORAGE = "deferred"): an anonymous
+visitor's empty cart is nothing but its code in the cart_code cookie.
+get_cart / get_cart_stat answer it without writing, and the Cart row is
+created by the first add_item or batch change.
+
+``cart_summary()`` feeds the header badge: item count and total for a
+user's open cart or a guest cart_code, cached under a versioned
+"cart-summary:..." key and rebuilt with one aggregate on a miss. Every
+write path calls ``invalidate_summary()``, which moves the version on
+once its transaction commits (a summary computed concurrently is stored
+under the old version and never read). Saving a product does the same
+for the open carts holding it; price changes made with QuerySet.update()
+show up within CART_SUMMARY_TIMEOUT.
+"""
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+
+from .models import MAX_PK, Cart, CartItem, Product, cart_totals
+
+logger = logging.getLogger(__name__)
+
+
+OPERATIONS = ("add", "set", "remove")
+
+
+class InvalidOperation(ValueError):
+    pass
+
+
+def normalise_size(size):
+    return (size or "").strip()
+
+
+COLUMNS = ("cart_id", "product_id", "size", "quantity", "added_at")
+
+
+def upsert_increment(source, params):
+    """
+    INSERT the (cart_id, product_id, size, quantity, added_at) rows that
+    `source` (a VALUES list or a SELECT) produces, adding the quantity to
+    lines that already exist. Returns [(id, product_id, size, quantity)].
+    """
+    qn = connection.ops.quote_name
+    table = qn(CartItem._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({", ".join(qn(column) for column in COLUMNS)})
+            {source}
+            ON CONFLICT ({qn("cart_id")}, {qn("product_id")}, {qn("size")})
+            DO UPDATE SET {qn("quantity")} = {table}.{qn("quantity")} + excluded.{qn("quantity")}
+            RETURNING {qn("id")}, {qn("product_id")}, {qn("size")}, {qn("quantity")}
+            """,
+            params,
+        )
+        return cursor.fetchall()
+
+
+def add_lines(cart_id, lines):
+    """
+    Insert or increment several (product_id, size, quantity) lines in one
+    statement. Returns {(product_id, size): (item_id, new_quantity)}.
+    """
+    if not lines:
+        return {}
+    added_at = CartItem._meta.get_field("added_at").get_db_prep_value(timezone.now(), connection)
+
+    params = []
+    for product_id, size, quantity in lines:
+        params += [cart_id, product_id, normalise_size(size), quantity, added_at]
+
+    rows = upsert_increment(f"VALUES {', '.join(['(%s, %s, %s, %s, %s)'] * len(lines))}", params)
+    return {(product_id, size): (pk, quantity) for pk, product_id, size, quantity in rows}
+
+
+def add_to_cart(cart_id, product_id, quantity=1, size=""):
+    """Insert or increment one cart line. Returns (item_id, new_quantity)."""
+    size = normalise_size(size)
+    return add_lines(cart_id, [(product_id, size, quantity)])[(product_id, size)]
+
+
+def parse_operations(operations):
+    """
+    Fold operations into {(product_id, size): ("add" | "set", quantity)},
+    in request order: add after set stays absolute, remove is set 0.
+    Raises InvalidOperation for malformed operations or unknown products.
+    """
+    if not isinstance(operations, list):
+        raise InvalidOperation("operations must be a list")
+    max_operations = getattr(settings, "CART_BATCH_MAX_OPERATIONS", 100)
+    if len(operations) > max_operations:
+        raise InvalidOperation(f"At most {max_operations} operations per request")
+
+    max_quantity = getattr(settings, "CART_MAX_LINE_QUANTITY", 999)
+    max_size = CartItem._meta.get_field("size").max_length
+
+    changes = {}
+    for position, operation in enumerate(operations):
+        try:
+            op = operation["op"]
+            product_id = int(operation["product_id"])
+            quantity = int(operation["quantity"] if op == "set" else operation.get("quantity", 1))
+            size = normalise_size(operation.get("size"))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            raise InvalidOperation(f"operations[{position}]: op, product_id (and quantity for set) are required")
+
+        if op not in OPERATIONS:
+            raise InvalidOperation(f"operations[{position}]: op must be one of {', '.join(OPERATIONS)}")
+        if op == "add" and quantity < 1 or op == "set" and quantity < 0:
+            raise InvalidOperation(f"operations[{position}]: invalid quantity")
+        if not 1 <= product_id <= MAX_PK:
+            raise InvalidOperation(f"operations[{position}]: invalid product_id")
+        if len(size) > max_size:
+            raise InvalidOperation(f"operations[{position}]: size is longer than {max_size} characters")
+
+        key = (product_id, size)
+        kind, current = changes.get(key, ("add", 0))
+        if op == "add":
+            changes[key] = (kind, current + quantity)
+        else:
+            changes[key] = ("set", quantity if op == "set" else 0)
+        if changes[key][1] > max_quantity:
+            raise InvalidOperation(f"operations[{position}]: at most {max_quantity} of a product per line")
+
+    product_ids = {product_id for product_id, _ in changes}
+    found = set(Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True))
+    missing = sorted(product_ids - found)
+    if missing:
+        raise InvalidOperation(f"Unknown product ids: {', '.join(map(str, missing))}")
+    return changes
+
+
+def apply_operations(cart, changes):
+    """Apply parse_operations() `changes` to `cart` atomically."""
+    adds, sets, removes = [], [], Q()
+    for (product_id, size), (kind, quantity) in changes.items():
+        if kind == "add" and quantity:
+            adds.append((product_id, size, quantity))
+        elif kind == "set" and quantity:
+            sets.append(CartItem(cart=cart, product_id=product_id, size=size, quantity=quantity))
+        elif kind == "set":
+            removes |= Q(product_id=product_id, size=size)
+
+    with transaction.atomic():
+        invalidate_summary(cart)
+        add_lines(cart.pk, adds)
+        if sets:
+            CartItem.objects.bulk_create(
+                sets,
+                update_conflicts=True,
+                unique_fields=["cart", "product", "size"],
+                update_fields=["quantity"],
+            )
+        if removes:
+            CartItem.objects.filter(removes, cart=cart).delete()
+
+
+def merge_cart_lines(source_cart_id, target_cart_id):
+    """Upsert every line of one cart into another in a single statement."""
+    qn = connection.ops.quote_name
+    # WHERE is required: it keeps SQLite from reading ON CONFLICT as a join
+    return upsert_increment(
+        f"""
+        SELECT %s, {qn("product_id")}, {qn("size")}, {qn("quantity")}, {qn("added_at")}
+        FROM {qn(CartItem._meta.db_table)} WHERE {qn("cart_id")} = %s
+        """,
+        [target_cart_id, source_cart_id],
+    )
+
+
+def merge_guest_cart(user, cart_code):
+    """
+    Move the unpaid guest cart `cart_code` into `user`'s open cart and
+    delete it. Returns the user's cart, or None when there was nothing to
+    merge. Errors are logged, never raised: login must not fail on a cart.
+    """
+    if not cart_code:
+        return None
+    try:
+        with transaction.atomic():
+            guest_cart = (
+                Cart.objects.select_for_update()
+                .filter(cart_code=cart_code, paid=False, user__isnull=True)
+                .first()
+            )
+            if not guest_cart:
+                return None
+            user_cart, _ = Cart.objects.get_or_create(user=user, paid=False)
+            merge_cart_lines(guest_cart.pk, user_cart.pk)
+            guest_cart.delete()
+            invalidate_summary(guest_cart, user_cart)
+            return user_cart
+    except Exception:
+        logger.exception("Merging guest cart %s into user %s failed", cart_code, user.pk)
+        return None
+
+
+def deferred_guest_carts():
+    return getattr(settings, "GUEST_CART_STORAGE", "deferred") == "deferred"
+
+
+def find_guest_cart(cart_code):
+    """
+    (cart, cart_code) for an anonymous visitor, without writing: the
+    unpaid Cart with that code (totals annotated) or None while nothing
+    has been added. A missing or already-paid code is replaced by a new one.
+    """
+    if cart_code:
+        cart = Cart.objects.with_totals().filter(cart_code=cart_code).first()
+        if cart is None or not cart.paid:
+            return cart, cart_code
+    return None, get_random_string(length=10)
+
+
+def empty_cart_data(cart_code):
+    """CartSerializer's shape for a guest cart that has no row yet."""
+    return {
+        "id": None,
+        "cart_code": cart_code,
+        "paid": False,
+        "items": [],
+        "total_items": 0,
+        "total_price": Decimal("0.00"),
+        "created_at": None,
+        "updated_at": None,
+    }
+
+
+def summary_key(user_id=None, cart_code=None):
+    return f"cart-summary:user:{user_id}" if user_id else f"cart-summary:code:{cart_code}"
+
+
+def summary_version(key):
+    """The current version token of summary `key` (a fresh one if it has none yet)."""
+    version = cache.get(f"{key}:version")
+    if version is None:
+        cache.add(f"{key}:version", get_random_string(12), None)
+        version = cache.get(f"{key}:version")
+    return version
+
+
+def invalidate_summary(*carts):
+    """Give `carts` new summary versions once the current transaction commits."""
+    keys = [summary_key(cart_code=cart.cart_code) for cart in carts]
+    keys += [summary_key(user_id=cart.user_id) for cart in carts if cart.user_id]
+    if keys:
+        transaction.on_commit(
+            lambda: cache.set_many({f"{key}:version": get_random_string(12) for key in keys}, None)
+        )
+
+
+def invalidate_product_summaries(product_id):
+    """Invalidate every open cart holding `product_id` (its price may have changed)."""
+    invalidate_summary(*Cart.objects.filter(paid=False, items__product_id=product_id).distinct())
+
+
+def cart_summary(user=None, cart_code=None):
+    """{"total_items", "total_price"} of the user's open cart, or of a guest cart_code."""
+    key = summary_key(user.pk if user else None, cart_code)
+    # Read before the aggregate: a write committing meanwhile moves the
+    # version on, so what this call caches is never read back
+    versioned_key = f"{key}:{summary_version(key)}"
+    summary = cache.get(versioned_key)
+    if summary is None:
+        lookup = {"cart__user": user} if user else {"cart__cart_code": cart_code}
+        totals = CartItem.objects.filter(cart__paid=False, **lookup).aggregate(**cart_totals())
+        summary = {"total_items": totals["cart_total_items"], "total_price": totals["cart_total_price"]}
+        cache.set(versioned_key, summary, getattr(settings, "CART_SUMMARY_TIMEOUT", 300))
+    return summary
@@ -0,0 +1,63 @@
+"""
+Garbage collection for rows nothing else ever deletes.
+
+``stale_querysets()`` describes what is safe to drop:
+
+* unpaid guest carts (and their items) untouched for
+  GUEST_CART_RETENTION_DAYS,
+* paid carts verify_payment emptied, after PAID_CART_RETENTION_DAYS
+  (Payment.cart is set to NULL; orders keep their own items),
+* password-reset OTPs older than PASSWORD_RESET_OTP_RETENTION_HOURS.
+
+``purge()`` walks a queryset in primary-key order and deletes
+PURGE_BATCH_SIZE rows per short transaction, so the job
+(``manage.py purge_stale_data``) never holds locks for long.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from accounts.models import PasswordResetOTP
+
+from .models import Cart, CartItem
+
+
+def stale_querysets(now=None):
+    """{label: queryset of rows past their retention}."""
+    now = now or timezone.now()
+    guest_cutoff = now - timedelta(days=getattr(settings, "GUEST_CART_RETENTION_DAYS", 30))
+    paid_cutoff = now - timedelta(days=getattr(settings, "PAID_CART_RETENTION_DAYS", 7))
+    otp_cutoff = now - timedelta(hours=getattr(settings, "PASSWORD_RESET_OTP_RETENTION_HOURS", 24))
+
+    items = CartItem.objects.filter(cart=OuterRef("pk"))
+    return {
+        "guest carts": Cart.objects.filter(user__isnull=True, paid=False, updated_at__lt=guest_cutoff)
+        .exclude(Exists(items.filter(added_at__gte=guest_cutoff))),
+        "emptied paid carts": Cart.objects.filter(paid=True, updated_at__lt=paid_cutoff)
+        .exclude(Exists(items)),
+        "password reset OTPs": PasswordResetOTP.objects.filter(created_at__lt=otp_cutoff),
+    }
+
+
+def purge(queryset, batch_size=None):
+    """
+    Delete `queryset` in primary-key order, one transaction per batch.
+    Yields (rows, rows including cascades) per batch. The filter is
+    re-applied on delete, so a row touched meanwhile is kept.
+    """
+    batch_size = batch_size or getattr(settings, "PURGE_BATCH_SIZE", 1000)
+    last_pk = None
+    while True:
+        batch = queryset.order_by("pk")
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        ids = list(batch.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return
+        with transaction.atomic():
+            total, per_model = queryset.filter(pk__in=ids).delete()
+        yield per_model.get(queryset.model._meta.label, 0), total
+        last_pk = ids[-1]
@@ -0,0 +1,65 @@
+"""
+Conditional GET (ETag / Last-Modified) for catalog endpoints.
+
+A view's validators come from one aggregate query over the rows it would
+render (row count + newest ``updated_at``), so If-None-Match /
+If-Modified-Since are answered with a 304 before anything is serialized.
+
+The count catches deletions and rows leaving a filter; the timestamp
+catches edits. Product.updated_at is also bumped when its images or
+stock change (products/signals.py).
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+
+
+def queryset_validators(queryset, *timestamp_fields):
+    """(etag, last_modified) for everything `queryset` matches."""
+    timestamp_fields = timestamp_fields or ("updated_at",)
+    aggregates = {f"newest_{i}": Max(field) for i, field in enumerate(timestamp_fields)}
+    result = queryset.order_by().aggregate(rows=Count("pk"), **aggregates)
+
+    stamps = [result[key] for key in aggregates if result[key] is not None]
+    last_modified = max(stamps) if stamps else None
+
+    token = f"{result['rows']}:{last_modified.isoformat() if last_modified else ''}"
+    etag = 'W/"%s"' % hashlib.md5(token.encode()).hexdigest()
+    return etag, last_modified
+
+
+def conditional(validators):
+    """
+    Wrap a GET view so `validators(request, *args, **kwargs)` → (etag,
+    last_modified) is checked first; a match returns 304 without calling
+    the view. Apply below @api_view so the DRF request is passed through.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = validators(request, *args, **kwargs)
+
+            # One ETag per negotiated format (JSON / MessagePack / browsable API)
+            renderer_format = getattr(getattr(request, "accepted_renderer", None), "format", "json")
+            if renderer_format != "json":
+                etag = f'{etag[:-1]}-{renderer_format}"'
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view(request, *args, **kwargs)
+
+            if response.status_code in (200, 304):
+                patch_vary_headers(response, ("Accept",))
+                response.setdefault("ETag", etag)
+                if timestamp is not None:
+                    response.setdefault("Last-Modified", http_date(timestamp))
+            return response
+        return wrapped
+    return decorator
@@ -0,0 +1,125 @@
+"""
+"Frequently bought together" from order history.
+
+``rebuild()`` (``manage.py rebuild_cooccurrence``) streams the distinct
+(order, product) pairs of every OrderItem into a sparse orders × products
+incidence matrix X and computes C = Xᵀ·X with scipy, so C[a, b] is the
+number of orders containing both a and b. Only each product's top
+COOCCURRENCE_TOP_K neighbours are written to ProductCooccurrence.
+
+``record_order()`` is called by verify_payment for every new order and
+bumps the pairs it contains with one INSERT ... ON CONFLICT DO UPDATE,
+so concurrent orders never lose an increment. Between rebuilds that is
+approximate for pairs that fell outside the stored top-K (they restart
+at 1); the next rebuild makes the table exact again.
+
+``neighbours()`` is the read side: one range scan of cooccurrence_top_idx.
+"""
+from itertools import permutations
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+
+from .models import OrderItem, ProductCooccurrence
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional dependency (batch job only)
+    np = sparse = None
+
+
+def top_k():
+    return getattr(settings, "COOCCURRENCE_TOP_K", 20)
+
+
+def neighbours(product_id, limit=None):
+    """[(product_id, orders_together), ...], most frequent first."""
+    limit = min(limit or top_k(), top_k())
+    return list(
+        ProductCooccurrence.objects.filter(product_id=product_id)
+        .order_by("-count", "other_id")
+        .values_list("other_id", "count")[:limit]
+    )
+
+
+def order_pairs(chunk_size=100_000):
+    """Distinct (order_id, product_id) pairs as two int64 arrays."""
+    order_ids, product_ids = [], []
+    rows = OrderItem.objects.values_list("order_id", "product_id").distinct().order_by()
+    for order_id, product_id in rows.iterator(chunk_size=chunk_size):
+        order_ids.append(order_id)
+        product_ids.append(product_id)
+    return np.asarray(order_ids, dtype=np.int64), np.asarray(product_ids, dtype=np.int64)
+
+
+def cooccurrence_matrix(order_ids, product_ids):
+    """(C, products): C[i, j] = orders containing products[i] and products[j], i ≠ j."""
+    orders, order_index = np.unique(order_ids, return_inverse=True)
+    products, product_index = np.unique(product_ids, return_inverse=True)
+
+    incidence = sparse.csr_matrix(
+        (np.ones(len(order_index), dtype=np.int32), (order_index, product_index)),
+        shape=(len(orders), len(products)),
+    )
+    matrix = (incidence.T @ incidence).tocsr()
+    matrix.setdiag(0)
+    matrix.eliminate_zeros()
+    return matrix, products
+
+
+def top_neighbours(matrix, products, k):
+    """Yield (product_id, other_id, count) for each row's k largest entries."""
+    for row in range(matrix.shape[0]):
+        start, end = matrix.indptr[row], matrix.indptr[row + 1]
+        if start == end:
+            continue
+        counts = matrix.data[start:end]
+        columns = matrix.indices[start:end]
+        if len(counts) > k:
+            keep = np.argpartition(-counts, k - 1)[:k]
+            counts, columns = counts[keep], columns[keep]
+        for column, count in zip(products[columns].tolist(), counts.tolist()):
+            yield products[row].item(), column, count
+
+
+def rebuild(batch_size=5000):
+    """Recompute the whole table from OrderItem. Returns rows written."""
+    if np is None:
+        raise ImproperlyConfigured("Rebuilding co-occurrence requires numpy and scipy.")
+
+    order_ids, product_ids = order_pairs()
+    rows = []
+    if len(order_ids):
+        matrix, products = cooccurrence_matrix(order_ids, product_ids)
+        rows = [
+            ProductCooccurrence(product_id=product_id, other_id=other_id, count=count)
+            for product_id, other_id, count in top_neighbours(matrix, products, top_k())
+        ]
+
+    with transaction.atomic():
+        ProductCooccurrence.objects.all().delete()
+        ProductCooccurrence.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def record_order(order, max_products=50):
+    """Count one more co-purchase for every pair of products in `order`."""
+    product_ids = sorted(set(order.items.values_list("product_id", flat=True)))[:max_products]
+    if len(product_ids) < 2:
+        return
+
+    pairs = list(permutations(product_ids, 2))
+    qn = connection.ops.quote_name
+    table = qn(ProductCooccurrence._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({qn("product_id")}, {qn("other_id")}, {qn("count")})
+            VALUES {", ".join(["(%s, %s, 1)"] * len(pairs))}
+            ON CONFLICT ({qn("product_id")}, {qn("other_id")})
+            DO UPDATE SET {qn("count")} = {table}.{qn("count")} + 1
+            """,
+            [product_id for pair in pairs for product_id in pair],
+        )
@@ -0,0 +1,113 @@
+"""
+Serialized-product document cache.
+
+ProductSerializer output for each product is cached per field profile
+under ``product-doc:<profile>:<id>:<updated_at>`` and listing views
+assemble their response with one cache multi-get, serializing (and
+prefetching) only the misses. A custom ?fields= list that no profile
+smaller than "detail" covers is serialized directly instead, computing
+and prefetching only the fields asked for.
+
+updated_at is in the key, so an edit made by any process (another
+worker, a management command, a shell) is picked up by every process
+on its next read: the old entry is simply never asked for again and
+ages out after PRODUCT_DOCUMENT_TIMEOUT. Product.updated_at also moves
+when its images, stock or image variants change (products/signals.py,
+products/images.py); QuerySet.update() on a Product must set it too.
+
+Documents hold absolute image URLs, so each entry remembers the base URL
+it was built for and is treated as a miss from any other host.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+
+from .models import product_prefetch
+from .serializers import PRODUCT_PROFILES, ProductSerializer
+
+
+def document_key(product, profile="detail"):
+    version = int(product.updated_at.timestamp() * 1_000_000) if product.updated_at else 0
+    return f"product-doc:{profile}:{product.pk}:{version}"
+
+
+def requested_fields(request):
+    """
+    ?fields=card / detail  → that profile's fields
+    ?fields=id,name,price  → just those (unknown names ignored)
+    Anything else          → None (every field)
+    """
+    raw = request.query_params.get("fields") if request else None
+    if not raw:
+        return None
+    if raw in PRODUCT_PROFILES:
+        return PRODUCT_PROFILES[raw]
+    known = ProductSerializer.Meta.fields
+    fields = tuple(name for name in raw.split(",") if name in known)
+    return fields or None
+
+
+def covering_profile(fields):
+    """
+    Smallest cached profile that includes every field in `fields`, or
+    None when only the full "detail" one would (cheaper to serialize just
+    those fields than to build and trim a detail document).
+    """
+    if fields is None or set(fields) >= set(ProductSerializer.Meta.fields):
+        return "detail"
+    for profile, profile_fields in PRODUCT_PROFILES.items():
+        if profile_fields is not None and set(fields) <= set(profile_fields):
+            return profile
+    return None
+
+
+def serialize(products, request, fields):
+    """ProductSerializer output, prefetching only what `fields` read."""
+    prefetch_related_objects(products, *product_prefetch(fields=fields))
+    return ProductSerializer(products, many=True, fields=fields, context={"request": request}).data
+
+
+def product_documents(products, request, fields=None):
+    """
+    Serialized documents for `products` (model instances), in order,
+    limited to `fields` when given. Field lists no profile covers bypass
+    the cache.
+    """
+    products = list(products)
+    if not products:
+        return []
+
+    profile = covering_profile(fields)
+    if profile is None:
+        return list(serialize(products, request, fields))
+    profile_fields = PRODUCT_PROFILES[profile]
+
+    base = request.build_absolute_uri("/") if request else ""
+    keys = {product.pk: document_key(product, profile) for product in products}
+    cached = cache.get_many(keys.values())
+
+    documents = {}
+    misses = []
+    for product in products:
+        entry = cached.get(keys[product.pk])
+        if entry and entry["base"] == base:
+            documents[product.pk] = entry["doc"]
+        else:
+            misses.append(product)
+
+    if misses:
+        data = serialize(misses, request, profile_fields)
+        fresh = {product.pk: doc for product, doc in zip(misses, data)}
+        cache.set_many(
+            {keys[pk]: {"base": base, "doc": doc} for pk, doc in fresh.items()},
+            getattr(settings, "PRODUCT_DOCUMENT_TIMEOUT", 3600),
+        )
+        documents.update(fresh)
+
+    if fields is None or set(fields) == set(profile_fields or ()):
+        return [documents[product.pk] for product in products]
+    return [
+        {name: value for name, value in documents[product.pk].items() if name in fields}
+        for product in products
+    ]
+
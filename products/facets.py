@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from .models import Product, ProductStock
+
+
+FACETS = ("brand", "category", "price", "size")
+
+
+def requested_facets(request):
+    """
+    ?facets=1 / true / all  → every facet
+    ?facets=brand,price     → just those
+    """
+    raw = request.query_params.get("facets")
+    if not raw:
+        return ()
+    if raw.lower() in ("1", "true", "all"):
+        return FACETS
+    return tuple(name for name in raw.split(",") if name in FACETS)
+
+
+def compute_facets(queryset, names=FACETS):
+    """
+    Grouped counts for the filter sidebar over everything `queryset`
+    matches (not just the current page). One GROUP BY query per facet.
+    """
+    # Re-select by id so annotations / ordering / prefetches on the
+    # listing queryset don't leak into the GROUP BY.
+    matching = Product.objects.filter(pk__in=queryset.order_by().values("pk"))
+    facets = {}
+
+    if "brand" in names:
+        facets["brand"] = list(
+            matching.exclude(brand__isnull=True).exclude(brand="")
+            .values("brand")
+            .annotate(count=Count("id"))
+            .order_by("-count", "brand")
+        )
+
+    if "category" in names:
+        facets["category"] = [
+            {"id": row["category_id"], "name": row["category__name"],
+             "slug": row["category__slug"], "count": row["count"]}
+            for row in matching.values("category_id", "category__name", "category__slug")
+            .annotate(count=Count("id"))
+            .order_by("-count", "category__name")
+        ]
+
+    if "price" in names:
+        facets["price"] = price_histogram(matching)
+
+    if "size" in names:
+        facets["size"] = list(
+            ProductStock.objects.filter(product__in=matching, quantity__gt=0)
+            .values("size")
+            .annotate(count=Count("product", distinct=True))
+            .order_by("size")
+        )
+
+    return facets
+
+
+def price_histogram(queryset):
+    bounds = list(getattr(settings, "PRODUCT_PRICE_BUCKETS", (500, 1000, 2000, 5000)))
+
+    bucket = Case(
+        *[When(price__lt=upper, then=Value(index)) for index, upper in enumerate(bounds)],
+        default=Value(len(bounds)),
+        output_field=IntegerField(),
+    )
+    counts = dict(
+        queryset.annotate(bucket=bucket)
+        .values("bucket")
+        .annotate(count=Count("id"))
+        .values_list("bucket", "count")
+    )
+
+    edges = [0] + bounds + [None]
+    return [
+        {"min": edges[index], "max": edges[index + 1], "count": counts.get(index, 0)}
+        for index in range(len(bounds) + 1)
+    ]
@@ -0,0 +1,139 @@
+"""
+Resized image derivatives (WebP / JPEG at fixed widths).
+
+When a Product, Category or ProductImage is saved with a new image, the
+variants are generated in a background thread pool (products/signals.py
+queues them after commit) and recorded on the row's ``image_variants``:
+
+    {"source": "products/x.png",
+     "webp": {"320": "derivatives/products/x_320w.webp", ...},
+     "jpeg": {"320": "derivatives/products/x_320w.jpg", ...}}
+
+Serializers turn that into a ``srcset``-style map of absolute URLs.
+Images narrower than a width are never upscaled to it. Existing uploads
+are backfilled with ``manage.py generate_image_variants``.
+"""
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import Category, Product, ProductImage
+
+
+logger = logging.getLogger(__name__)
+
+IMAGE_MODELS = (Product, Category, ProductImage)
+EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+_executor = None
+
+
+def variant_widths():
+    return tuple(getattr(settings, "IMAGE_VARIANT_WIDTHS", (320, 640, 1024)))
+
+
+def variant_formats():
+    return tuple(getattr(settings, "IMAGE_VARIANT_FORMATS", ("webp", "jpeg")))
+
+
+def variant_name(source, width, image_format):
+    stem, _ = os.path.splitext(source)
+    return f"derivatives/{stem}_{width}w.{EXTENSIONS[image_format]}"
+
+
+def needs_variants(instance):
+    """True when the row has an image whose variants weren't built yet."""
+    return bool(instance.image) and instance.image_variants.get("source") != instance.image.name
+
+
+def on_white(image):
+    """RGB copy of an RGBA `image` with its transparency composited onto white."""
+    background = Image.new("RGB", image.size, "white")
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+def build_variants(source):
+    """Write every derivative of storage file `source`; returns the variants map."""
+    quality = getattr(settings, "IMAGE_VARIANT_QUALITY", 80)
+    with default_storage.open(source, "rb") as handle:
+        original = ImageOps.exif_transpose(Image.open(handle))
+        original.load()
+    if original.mode not in ("RGB", "RGBA"):
+        original = original.convert("RGBA")  # P / LA / L: keep any transparency
+
+    variants = {"source": source}
+    for image_format in variant_formats():
+        variants[image_format] = {}
+        for width in variant_widths():
+            if width >= original.width:
+                continue
+            height = round(original.height * width / original.width)
+            resized = original.resize((width, height), Image.LANCZOS)
+            if image_format == "jpeg" and resized.mode == "RGBA":
+                resized = on_white(resized)  # JPEG has no alpha; cutouts would turn black
+
+            buffer = io.BytesIO()
+            resized.save(buffer, format=image_format.upper(), quality=quality)
+            name = variant_name(source, width, image_format)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            variants[image_format][str(width)] = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return variants
+
+
+def generate_variants(model, pk):
+    """Build and store variants for one row (runs in a worker thread)."""
+    try:
+        instance = model.objects.filter(pk=pk).first()
+        if instance is None or not needs_variants(instance):
+            return
+        variants = build_variants(instance.image.name)
+
+        # update() so saving the variants doesn't re-trigger the signal
+        if model is ProductImage:
+            model.objects.filter(pk=pk).update(image_variants=variants)
+            Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+        else:
+            model.objects.filter(pk=pk).update(image_variants=variants, updated_at=timezone.now())
+    except Exception:
+        logger.exception("Image variants failed for %s %s", model.__name__, pk)
+    finally:
+        connection.close()
+
+
+def queue_variants(instance):
+    """Generate variants for `instance` off the request path."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, "IMAGE_VARIANT_WORKERS", 2),
+            thread_name_prefix="image-variants",
+        )
+    return _executor.submit(generate_variants, type(instance), instance.pk)
+
+
+def image_srcset(instance, request):
+    """{"webp": {"320": url, ...}, "jpeg": {...}} for the current image, or {}."""
+    variants = instance.image_variants or {}
+    if not instance.image or variants.get("source") != instance.image.name:
+        return {}
+
+    def url(name):
+        url = default_storage.url(name)
+        return request.build_absolute_uri(url) if request else url
+
+    return {
+        image_format: {width: url(name) for width, name in variants[image_format].items()}
+        for image_format in variant_formats()
+        if image_format in variants
+    }
+
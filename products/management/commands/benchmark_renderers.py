@@ -0,0 +1,64 @@
+import timeit
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from products.renderers import FastJSONRenderer
+
+
+def sample_listing(count):
+    """`count` documents shaped like ProductSerializer output."""
+    now = timezone.now()
+    return [
+        {
+            "id": i,
+            "name": f"Cotton Kurta Set {i}",
+            "slug": f"cotton-kurta-set-{i}",
+            "description": "Soft breathable cotton, regular fit. Machine wash cold. " * 3,
+            "price": Decimal("1499.00") + i,
+            "original_price": Decimal("2199.00") + i,
+            "final_price": 1499.0 + i,
+            "discount_percent": 32,
+            "brand": "Little Origins",
+            "stock": [{"size": size, "quantity": i % 7} for size in ("S", "M", "L", "XL")],
+            "image": f"https://example.com/media/products/kurta_{i}.png",
+            "category": i % 12,
+            "is_trending": i % 3 == 0,
+            "is_top_deal": i % 5 == 0,
+            "images": [{"image": f"/media/products/gallery/kurta_{i}_{n}.png"} for n in range(3)],
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(count)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compare JSONRenderer and FastJSONRenderer on a product listing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def handle(self, *args, **options):
+        data = sample_listing(options["products"])
+        repeat = options["repeat"]
+
+        baseline = JSONRenderer().render(data)
+        fast = FastJSONRenderer().render(data)
+        if fast != baseline:
+            self.stderr.write(self.style.ERROR("❌ Renderer output differs"))
+            return
+
+        timings = {}
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            seconds = min(timeit.repeat(lambda: renderer.render(data), number=repeat, repeat=3))
+            timings[type(renderer).__name__] = seconds / repeat * 1000
+            self.stdout.write(f"{type(renderer).__name__:<18} {timings[type(renderer).__name__]:8.2f} ms / render")
+
+        speedup = timings["JSONRenderer"] / timings["FastJSONRenderer"]
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Identical output ({len(baseline)} bytes), {speedup:.1f}x faster"
+        ))
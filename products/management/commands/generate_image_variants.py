@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from products import images
+
+
+class Command(BaseCommand):
+    help = "Build resized WebP / JPEG variants for every uploaded product and category image."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--force", action="store_true", help="Rebuild variants that already exist.")
+
+    def handle(self, *args, **options):
+        jobs = []
+        for model in images.IMAGE_MODELS:
+            rows = model.objects.exclude(image="").exclude(image__isnull=True)
+            if options["force"]:
+                rows.update(image_variants={})
+                jobs.extend((model, pk) for pk in rows.values_list("pk", flat=True))
+            else:
+                jobs.extend((model, row.pk) for row in rows.only("pk", "image", "image_variants") if images.needs_variants(row))
+
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            list(pool.map(lambda job: images.generate_variants(*job), jobs))
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Image variants built ({len(jobs)} images)"))
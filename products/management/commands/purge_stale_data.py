@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from products import cleanup
+
+
+class Command(BaseCommand):
+    help = "Delete abandoned guest carts, emptied paid carts and expired password-reset OTPs in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be deleted.")
+
+    def handle(self, *args, **options):
+        for label, queryset in cleanup.stale_querysets().items():
+            if options["dry_run"]:
+                self.stdout.write(f"{label}: {queryset.count()} rows would be deleted")
+                continue
+
+            started = time.monotonic()
+            rows = total = 0
+            for deleted, with_cascades in cleanup.purge(queryset, options["batch_size"]):
+                rows += deleted
+                total += with_cascades
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ {label}: {rows} deleted ({total} rows with related) "
+                f"in {elapsed:.1f}s, {total / elapsed if elapsed else 0:.0f} rows/s"
+            ))
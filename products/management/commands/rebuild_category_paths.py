@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.models import Category
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized slug_path / id_path of every Category."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        changed = Category.rebuild_paths(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Category paths rebuilt ({changed} updated)"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products import cooccurrence
+
+
+class Command(BaseCommand):
+    help = "Rebuild the frequently-bought-together table from the full order history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        written = cooccurrence.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Co-occurrence rebuilt ({written} pairs)"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text product search index from scratch."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stdout.write(self.style.WARNING("⚠️ Full-text search is not supported on this database"))
+            return
+        search.rebuild()
+        self.stdout.write(self.style.SUCCESS("✅ Search index rebuilt"))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from products import similarity
+
+
+class Command(BaseCommand):
+    help = "Rebuild the similar-products table from the catalog."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--if-changed", action="store_true",
+            help="Skip the rebuild unless a product or category was saved since the last one.",
+        )
+
+    def handle(self, *args, **options):
+        if options["if_changed"] and not similarity.catalog_changed():
+            self.stdout.write("Catalog unchanged, similar products left as they are")
+            return
+        written = similarity.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Similar products rebuilt ({written} pairs)"))
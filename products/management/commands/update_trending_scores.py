@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products import trending
+
+
+class Command(BaseCommand):
+    help = "Decay trending scores and fold in orders / wishlist / cart adds since the last run."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        touched = trending.update_scores(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"✅ Trending scores updated ({touched} products)"))
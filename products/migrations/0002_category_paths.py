@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-17 16:21
+
+from django.db import migrations, models
+
+
+def backfill_category_paths(apps, schema_editor):
+    Category = apps.get_model("products", "Category")
+
+    children = {}
+    for category in Category.objects.only("id", "parent_id", "slug"):
+        children.setdefault(category.parent_id, []).append(category)
+
+    updated = []
+    stack = [(category, "", "/") for category in children.get(None, [])]
+    while stack:
+        category, parent_slug_path, parent_id_path = stack.pop()
+        category.slug_path = f"{parent_slug_path}/{category.slug}" if parent_slug_path else category.slug
+        category.id_path = f"{parent_id_path}{category.pk}/"
+        updated.append(category)
+        stack.extend((child, category.slug_path, category.id_path) for child in children.get(category.pk, []))
+
+    Category.objects.bulk_update(updated, ["slug_path", "id_path"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='id_path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='slug_path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=500),
+        ),
+        migrations.RunPython(backfill_category_paths, migrations.RunPython.noop),
+    ]
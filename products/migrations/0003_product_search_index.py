@@ -0,0 +1,63 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS products_search
+USING fts5(name, description, brand, category, tokenize='unicode61 remove_diacritics 2')
+"""
+
+SQLITE_FILL = """
+INSERT INTO products_search (rowid, name, description, brand, category)
+SELECT p.id, p.name, COALESCE(p.description, ''), COALESCE(p.brand, ''), c.name
+FROM products_product p
+JOIN products_category c ON c.id = p.category_id
+"""
+
+POSTGRES_CREATE = """
+CREATE TABLE IF NOT EXISTS products_search (
+    product_id bigint PRIMARY KEY REFERENCES products_product (id) ON DELETE CASCADE,
+    document tsvector NOT NULL
+)
+"""
+
+POSTGRES_INDEX = """
+CREATE INDEX IF NOT EXISTS products_search_document_gin ON products_search USING gin (document)
+"""
+
+POSTGRES_FILL = """
+INSERT INTO products_search (product_id, document)
+SELECT p.id,
+       setweight(to_tsvector('simple', p.name), 'A')
+    || setweight(to_tsvector('simple', COALESCE(p.brand, '')), 'B')
+    || setweight(to_tsvector('simple', c.name), 'B')
+    || setweight(to_tsvector('simple', COALESCE(p.description, '')), 'C')
+FROM products_product p
+JOIN products_category c ON c.id = p.category_id
+"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == "sqlite":
+        schema_editor.execute(SQLITE_CREATE)
+        schema_editor.execute(SQLITE_FILL)
+    elif vendor == "postgresql":
+        schema_editor.execute(POSTGRES_CREATE)
+        schema_editor.execute(POSTGRES_INDEX)
+        schema_editor.execute(POSTGRES_FILL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ("sqlite", "postgresql"):
+        schema_editor.execute("DROP TABLE IF EXISTS products_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_category_paths'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import Count, Min, Q, Sum
+
+
+def merge_null_sizes(apps, schema_editor):
+    """Fold size-less lines that only differ by NULL / "" into one, then store ""."""
+    CartItem = apps.get_model("products", "CartItem")
+    sizeless = CartItem.objects.filter(Q(size__isnull=True) | Q(size=""))
+    duplicates = (
+        sizeless.values("cart_id", "product_id")
+        .annotate(keep=Min("id"), total=Sum("quantity"), rows=Count("id"))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        lines = sizeless.filter(cart_id=row["cart_id"], product_id=row["product_id"])
+        lines.exclude(id=row["keep"]).delete()
+        CartItem.objects.filter(id=row["keep"]).update(quantity=row["total"])
+    CartItem.objects.filter(size__isnull=True).update(size="")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_similar_products'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_null_sizes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='size',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
@@ -1,15 +1,40 @@
-from django.db import models
+from django.db import connection, models
 from django.utils.text import slugify
 from django.contrib.auth import get_user_model
 from django.utils.crypto import get_random_string
 from django.db import models
 from datetime import timedelta
 from django.utils import timezone
-from django.db.models import JSONField
+from decimal import Decimal
+from django.db.models import Case, DecimalField, F, JSONField, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat, Round, Substr
+from django.db.models.lookups import Exact, GreaterThan
 
 
 User = get_user_model()
 
+# Largest id a BigAutoField holds; bigger client-supplied ids overflow the driver
+MAX_PK = 2 ** 63 - 1
+
+
+def subtree_lookup(id_path, through=""):
+    """
+    Filter kwargs matching every id_path under `id_path` ("/1/5/").
+
+    A plain prefix match (startswith), which PostgreSQL serves from the
+    varchar_pattern_ops "_like" index Django adds for db_index CharFields
+    whatever the database collation is. SQLite's LIKE is case-insensitive
+    and can't use the index, so there the prefix is written as the range
+    ["/1/5/", "/1/50") instead — exact under SQLite's byte-order (BINARY)
+    collation, since "0" sorts right after "/".
+    """
+    if connection.vendor == "sqlite":
+        return {
+            f"{through}id_path__gte": id_path,
+            f"{through}id_path__lt": id_path[:-1] + "0",
+        }
+    return {f"{through}id_path__startswith": id_path}
+
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -23,15 +48,129 @@ class Category(models.Model):
         related_name="children"
     )
 
+    # ⭐ MATERIALIZED PATHS (kept in sync on save / re-parent)
+    # slug_path: "men/shirts/formal"  → resolve a URL path in one query
+    # id_path:   "/1/5/12/"           → whole subtree via one prefix match
+    slug_path = models.CharField(max_length=500, blank=True, default="", db_index=True, editable=False)
+    id_path = models.CharField(max_length=255, blank=True, default="", db_index=True, editable=False)
+
+    # Conditional GET validator (bumped on save and on path rewrites)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Resized derivatives of `image` (see products/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+
+        old_slug_path, old_id_path = self.slug_path, self.id_path
         super().save(*args, **kwargs)
+        self.refresh_paths(old_slug_path, old_id_path)
+
+    def build_paths(self):
+        """Compute (slug_path, id_path) from the parent's stored paths."""
+        if self.parent_id:
+            parent_slug_path, parent_id_path = (
+                Category.objects.filter(pk=self.parent_id)
+                .values_list("slug_path", "id_path")
+                .get()
+            )
+            return f"{parent_slug_path}/{self.slug}", f"{parent_id_path}{self.pk}/"
+        return self.slug, f"/{self.pk}/"
+
+    def refresh_paths(self, old_slug_path="", old_id_path=""):
+        """
+        Store this node's paths and rewrite every descendant's prefix
+        in two UPDATE statements when the node was renamed or re-parented.
+        """
+        slug_path, id_path = self.build_paths()
+        if (slug_path, id_path) == (old_slug_path, old_id_path):
+            return
+
+        Category.objects.filter(pk=self.pk).update(slug_path=slug_path, id_path=id_path)
+        self.slug_path, self.id_path = slug_path, id_path
+
+        if old_id_path:
+            descendants = Category.objects.filter(**subtree_lookup(old_id_path)).exclude(pk=self.pk)
+            descendants.update(
+                slug_path=Concat(Value(slug_path), Substr("slug_path", len(old_slug_path) + 1)),
+                id_path=Concat(Value(id_path), Substr("id_path", len(old_id_path) + 1)),
+                updated_at=timezone.now(),
+            )
+
+    def get_descendants(self, include_self=True):
+        categories = Category.objects.filter(**subtree_lookup(self.id_path))
+        if not include_self:
+            categories = categories.exclude(pk=self.pk)
+        return categories
+
+    @classmethod
+    def rebuild_paths(cls, batch_size=500):
+        """
+        Recompute slug_path / id_path for the whole tree from the parent
+        links (one SELECT + batched bulk UPDATEs). Returns rows changed.
+        """
+        children = {}
+        for category in cls.objects.only("id", "parent_id", "slug", "slug_path", "id_path"):
+            children.setdefault(category.parent_id, []).append(category)
+
+        stale = []
+        now = timezone.now()
+        stack = [(category, "", "/") for category in children.get(None, [])]
+        while stack:
+            category, parent_slug_path, parent_id_path = stack.pop()
+            slug_path = f"{parent_slug_path}/{category.slug}" if parent_slug_path else category.slug
+            id_path = f"{parent_id_path}{category.pk}/"
+            if (category.slug_path, category.id_path) != (slug_path, id_path):
+                category.slug_path, category.id_path = slug_path, id_path
+                category.updated_at = now
+                stale.append(category)
+            stack.extend((child, slug_path, id_path) for child in children.get(category.pk, []))
+
+        cls.objects.bulk_update(stale, ["slug_path", "id_path", "updated_at"], batch_size=batch_size)
+        return len(stale)
 
     def __str__(self):
         return self.name
 
 
+# Relations ProductSerializer reads, keyed by the serializer field reading them
+PRODUCT_PREFETCH = {"images": "images", "stock": "variants"}
+
+
+def product_prefetch(through=None, fields=None):
+    """
+    Prefetch lookups for the product graph, optionally reached through a
+    relation, e.g. product_prefetch("items__product") for a cart.
+    With `fields`, only the relations those serializer fields read.
+    """
+    lookups = [
+        lookup for field, lookup in PRODUCT_PREFETCH.items()
+        if fields is None or field in fields
+    ]
+    if not through:
+        return lookups
+    return [f"{through}__{lookup}" for lookup in lookups]
+
+
+def rounded_percent(part, whole):
+    """
+    round(part / whole * 100) for two-decimal money amounts, as an SQL
+    expression. Halves round to even like Python's round() (SQL ROUND
+    rounds them away from zero); working in integer cents keeps ties exact.
+    """
+    part, whole = (Cast(Round(amount * 100), models.IntegerField()) for amount in (part, whole))
+    scaled = part * 100
+    quotient = scaled / whole  # integer division
+    twice_remainder = (scaled - quotient * whole) * 2
+    return Case(
+        When(GreaterThan(twice_remainder, whole), then=quotient + 1),
+        When(Exact(twice_remainder, whole), then=quotient + (quotient - quotient / 2 * 2)),
+        default=quotient,
+    )
+
+
 class Product(models.Model):
     name = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, blank=True)
@@ -49,10 +188,41 @@ class Product(models.Model):
     is_top_deal = models.BooleanField(default=False)
     rating = models.FloatField(default=4.0, blank=True)
 
+    # ⭐ STORED DISCOUNT (computed by the database, so it stays right
+    # through save(), QuerySet.update() and bulk_update() alike)
+    discount_percent = models.GeneratedField(
+        expression=Case(
+            When(
+                original_price__gt=F("price"),
+                then=rounded_percent(F("original_price") - F("price"), F("original_price")),
+            ),
+            default=Value(0),
+        ),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+
+    # Conditional GET validator; also bumped when images / stock change
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Resized derivatives of `image` (see products/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+
     # ⭐ ADD HERE — SIZE TYPE
    
    
-    
+    class Meta:
+        indexes = [
+            # ?ordering= sort keys (id is the keyset tie-breaker)
+            models.Index(fields=["price", "id"], name="product_price_idx"),
+            models.Index(fields=["-discount_percent", "id"], name="product_discount_idx"),
+            models.Index(fields=["-rating", "id"], name="product_rating_idx"),
+            # Hot filters: trending / top-deal shelves and brand facets
+            models.Index(fields=["id"], condition=models.Q(is_trending=True), name="product_trending_idx"),
+            models.Index(fields=["id"], condition=models.Q(is_top_deal=True), name="product_top_deal_idx"),
+            models.Index(fields=["brand"], name="product_brand_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
@@ -78,6 +248,7 @@ class ProductStock(models.Model):
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="images")
     image = models.ImageField(upload_to="products/gallery/")
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     # ⭐ Limit to max 3 images
     def save(self, *args, **kwargs):
@@ -113,6 +284,31 @@ class ProductImage(models.Model):
 
 
 
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+
+
+def cart_totals(through=""):
+    """
+    Aggregates for a cart's item count and price. `through` is the path
+    from the queried model to CartItem ("items__" from Cart, "" from
+    CartItem). Prices stay Decimal.
+    """
+    return {
+        "cart_total_items": Coalesce(Sum(f"{through}quantity"), 0),
+        "cart_total_price": Coalesce(
+            Sum(F(f"{through}quantity") * F(f"{through}product__price"), output_field=MONEY),
+            Value(Decimal("0.00")),
+            output_field=MONEY,
+        ),
+    }
+
+
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Annotate each cart's totals in the same query (read by Cart.total_*)."""
+        return self.annotate(**cart_totals("items__"))
+
+
 class Cart(models.Model):
     user = models.ForeignKey(
         User,
@@ -126,19 +322,38 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # get_or_create(user=..., paid=False); cart_code lookups use its unique index
+            models.Index(fields=["user", "paid"], name="cart_user_paid_idx"),
+        ]
+
     def __str__(self):
      if self.user:
         return f"Cart for {self.user.email}"
      return f"Guest Cart ({self.cart_code})"
 
+    objects = CartQuerySet.as_manager()
+
+    def totals(self):
+        """
+        (total_items, total_price): the with_totals() annotation when the
+        cart was loaded through it, otherwise one aggregate query whose
+        result is kept on the instance.
+        """
+        if not hasattr(self, "cart_total_price"):
+            totals = self.items.aggregate(**cart_totals())
+            self.cart_total_items = totals["cart_total_items"]
+            self.cart_total_price = totals["cart_total_price"]
+        return self.cart_total_items, self.cart_total_price
+
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self.totals()[0]
 
     @property
     def total_price(self):
-        # ✅ Using float instead of Decimal
-        return sum(float(item.quantity) * float(item.product.price) for item in self.items.all())
+        return self.totals()[1]
 
     def save(self, *args, **kwargs):
         # ✅ Auto-generate a cart code if not provided
@@ -154,10 +369,12 @@ class CartItem(models.Model):
     added_at = models.DateTimeField(auto_now_add=True)
 
     # models.py (inside CartItem)
+    # "" when the product has no size: NULLs never collide in the
+    # (cart, product, size) unique constraint that add_to_cart upserts on
     size = models.CharField(
     max_length=20,
-    null=True,
-    blank=True
+    blank=True,
+    default=""
     )
 
 
@@ -325,3 +542,77 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} ({self.size}) × {self.quantity}"
+
+
+# ============================================================
+# 🔥 TRENDING SCORES (see products/trending.py)
+# ============================================================
+class TrendingScore(models.Model):
+    """Time-decayed popularity of a product, refreshed in batches."""
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True, related_name="trending_score"
+    )
+    score = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-score", "product"], name="trending_score_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id}: {self.score:.2f}"
+
+
+class TrendingCursor(models.Model):
+    """How far each event table has been folded into TrendingScore."""
+    source = models.CharField(max_length=20, primary_key=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.source} → {self.last_id}"
+
+
+# ============================================================
+# 🛍 FREQUENTLY BOUGHT TOGETHER (see products/cooccurrence.py)
+# ============================================================
+class ProductCooccurrence(models.Model):
+    """How many orders contained both `product` and `other` (stored both ways)."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "other"], name="cooccurrence_pair_unique"),
+        ]
+        indexes = [
+            # Top-K neighbours of a product: one index range scan
+            models.Index(fields=["product", "-count", "other"], name="cooccurrence_top_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} + {self.other_id} ({self.count})"
+
+
+# ============================================================
+# 🧭 SIMILAR PRODUCTS (see products/similarity.py)
+# ============================================================
+class SimilarProduct(models.Model):
+    """Content similarity of `other` to `product` (cosine, 0–1)."""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    other = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="+")
+    score = models.FloatField()
+    built_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["product", "other"], name="similar_pair_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["product", "-score", "other"], name="similar_top_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} ~ {self.other_id} ({self.score:.2f})"
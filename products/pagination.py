@@ -0,0 +1,136 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+# ============================================================
+# 🔖 KEYSET (CURSOR) PAGINATION
+# ============================================================
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over a stable sort key, e.g. ("price", "id").
+
+    The cursor is an opaque token holding the sort-key values of the last
+    row of the previous page, so page N is fetched with a
+    `WHERE (price, id) > (last_price, last_id)` seek instead of an OFFSET
+    and costs the same as page 1.
+
+    The last ordering field must be unique ("id" / "-id") and every field
+    must be non-null and readable as an attribute of the row (model
+    field or annotation).
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering=("id",)):
+        self.ordering = tuple(ordering)
+        self.page_size = getattr(settings, "PRODUCT_PAGE_SIZE", 24)
+        self.max_page_size = getattr(settings, "PRODUCT_MAX_PAGE_SIZE", 100)
+
+    @classmethod
+    def is_requested(cls, request):
+        params = request.query_params
+        return cls.cursor_query_param in params or cls.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            position = self.cursor_values(queryset, position)
+            queryset = queryset.filter(self.seek_filter(position))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    # ------------------------
+    # Cursor helpers
+    # ------------------------
+    def seek_filter(self, position):
+        """(a, b, c) after (x, y, z)  →  a>x OR (a=x AND b>y) OR (a=x AND b=y AND c>z)."""
+        condition = Q()
+        equal_so_far = Q()
+        for ordering, value in zip(self.ordering, position):
+            field = ordering.lstrip("-")
+            lookup = "lt" if ordering.startswith("-") else "gt"
+            condition |= equal_so_far & Q(**{f"{field}__{lookup}": value})
+            equal_so_far &= Q(**{field: value})
+        return condition
+
+    def cursor_values(self, queryset, values):
+        """Decoded cursor values as the ordering fields' Python types (NotFound if they don't fit)."""
+        converted = []
+        for ordering, value in zip(self.ordering, values):
+            name = ordering.lstrip("-")
+            try:
+                annotation = queryset.query.annotations.get(name)
+                field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+                value = field.to_python(value)
+            except (FieldDoesNotExist, ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None or isinstance(value, (list, dict)):
+                raise NotFound(self.invalid_cursor_message)
+            converted.append(value)
+        return converted
+
+    def encode_cursor(self, row):
+        values = []
+        for ordering in self.ordering:
+            value = getattr(row, ordering.lstrip("-"))
+            if isinstance(value, Decimal):
+                value = str(value)
+            elif hasattr(value, "isoformat"):
+                value = value.isoformat()
+            values.append(value)
+        token = json.dumps({"o": self.ordering, "v": values}, separators=(",", ":"))
+        return base64.urlsafe_b64encode(token.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + "=" * (-len(encoded) % 4)
+            token = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            ordering, values = tuple(token["o"]), token["v"]
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # A cursor minted under a different sort order cannot seek this one
+        if ordering != self.ordering or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        return values
@@ -0,0 +1,82 @@
+"""
+Response renderers.
+
+FastJSONRenderer is a faster drop-in replacement for DRF's JSONRenderer.
+
+Enable it in REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"]. For strings,
+ints, bools, None, containers and the types DRF's JSONEncoder handles
+(Decimal, datetime, date, time, UUID, lazy strings...; they are handed
+to that encoder) the output is byte-for-byte JSONRenderer's default
+compact, UTF-8 output. Floats are where it differs:
+
+* exponents are written the shortest way: 1e16 → ``1e16`` (not
+  ``1e+16``), 1e-05 → ``0.00001``; both parse to the same number;
+* NaN and ±Infinity render as ``null``, where JSONRenderer raises.
+
+Without orjson installed, when indented / ASCII-only / non-compact
+output is asked for, or for data orjson rejects (ints beyond 64 bits),
+rendering falls back to JSONRenderer.
+
+MessagePackRenderer answers ``Accept: application/msgpack`` (or
+``?format=msgpack``) with the same payload MessagePack-encoded.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional dependency
+    msgpack = None
+
+
+_drf_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or not self.orjson_compatible(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        if data is None:
+            return b""
+
+        try:
+            ret = orjson.dumps(
+                data,
+                default=_drf_default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Same JavaScript-safe escaping JSONRenderer applies
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+
+    def orjson_compatible(self, accepted_media_type, renderer_context):
+        if self.ensure_ascii or not self.compact:
+            return False
+        return self.get_indent(accepted_media_type, renderer_context or {}) is None
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if msgpack is None:
+            raise ImproperlyConfigured("MessagePackRenderer requires the msgpack package.")
+        if data is None:
+            return b""
+        # Decimal / datetime / lazy strings become what the JSON payload holds
+        return msgpack.packb(data, default=_drf_default, use_bin_type=True)
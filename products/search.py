@@ -0,0 +1,159 @@
+"""
+Full-text product search.
+
+The index lives in a side table keyed by product id:
+
+* SQLite (dev)       → FTS5 virtual table ``products_search`` ranked with bm25()
+* PostgreSQL (prod)  → ``products_search(product_id, document tsvector)`` + GIN
+
+Rows are refreshed from products/signals.py whenever a Product or its
+Category is saved, and can be rebuilt with ``manage.py rebuild_search_index``.
+On any other backend every function here is a no-op and
+``search_queryset`` returns None so callers fall back to icontains.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+
+SEARCH_TABLE = "products_search"
+
+TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def is_supported():
+    return connection.vendor in ("sqlite", "postgresql")
+
+
+# ============================================================
+# 🧱 INDEX MAINTENANCE
+# ============================================================
+def _refresh(where="", params=()):
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN "
+                f"(SELECT p.id FROM products_product p {where})",
+                params,
+            )
+            cursor.execute(
+                f"""
+                INSERT INTO {SEARCH_TABLE} (rowid, name, description, brand, category)
+                SELECT p.id, p.name, COALESCE(p.description, ''), COALESCE(p.brand, ''), c.name
+                FROM products_product p
+                JOIN products_category c ON c.id = p.category_id
+                {where}
+                """,
+                params,
+            )
+
+    elif connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {SEARCH_TABLE} (product_id, document)
+                SELECT p.id,
+                       setweight(to_tsvector('simple', p.name), 'A')
+                    || setweight(to_tsvector('simple', COALESCE(p.brand, '')), 'B')
+                    || setweight(to_tsvector('simple', c.name), 'B')
+                    || setweight(to_tsvector('simple', COALESCE(p.description, '')), 'C')
+                FROM products_product p
+                JOIN products_category c ON c.id = p.category_id
+                {where}
+                ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document
+                """,
+                params,
+            )
+
+
+def index_products(product_ids):
+    product_ids = list(product_ids)
+    if not product_ids or not is_supported():
+        return
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    _refresh(f"WHERE p.id IN ({placeholders})", product_ids)
+
+
+def index_category(category_id):
+    """Re-index the products whose category name may have changed."""
+    if is_supported():
+        _refresh("WHERE p.category_id = %s", [category_id])
+
+
+def remove_products(product_ids):
+    product_ids = list(product_ids)
+    if not product_ids or not is_supported():
+        return
+    column = "rowid" if connection.vendor == "sqlite" else "product_id"
+    placeholders = ", ".join(["%s"] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE {column} IN ({placeholders})", product_ids)
+
+
+def rebuild():
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    _refresh()
+
+
+# ============================================================
+# 🔍 QUERYING
+# ============================================================
+def match_expression(query):
+    """The backend's full-text query for `query`, or None when it has no words."""
+    tokens = TOKEN_RE.findall(query.lower())
+    if not tokens:
+        return None
+    if connection.vendor == "sqlite":
+        return " ".join(f'"{token}"*' for token in tokens)
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+def search_queryset(queryset, query):
+    """
+    Restrict a Product queryset to rows matching every word of `query`
+    (prefix match, so it works while the user is still typing) and
+    annotate ``search_rank`` (lower is better). The match and the rank
+    run inside the same SQL as the caller's filters and ordering, so
+    nothing is capped before filtering.
+    Returns None when the database has no full-text index.
+    """
+    if not is_supported():
+        return None
+
+    match = match_expression(query)
+    if match is None:
+        # Still annotated, so callers can order by search_rank
+        return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    product = connection.ops.quote_name(queryset.model._meta.db_table)
+    if connection.vendor == "sqlite":
+        matching = RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [match])
+        # bm25 is negative-is-better already; name, description, brand, category weights
+        rank = RawSQL(
+            f"""
+            SELECT bm25({SEARCH_TABLE}, 10.0, 1.0, 4.0, 4.0) FROM {SEARCH_TABLE}
+            WHERE {SEARCH_TABLE} MATCH %s AND rowid = {product}.id
+            """,
+            [match],
+            output_field=FloatField(),
+        )
+    else:
+        matching = RawSQL(
+            f"SELECT product_id FROM {SEARCH_TABLE} WHERE document @@ to_tsquery('simple', %s)", [match]
+        )
+        rank = RawSQL(
+            f"""
+            SELECT -ts_rank(document, to_tsquery('simple', %s)) FROM {SEARCH_TABLE}
+            WHERE product_id = {product}.id
+            """,
+            [match],
+            output_field=FloatField(),
+        )
+    # The rank is correlated on the product table, so keep it in the
+    # outer query's SELECT / ORDER BY / WHERE (never inside a subquery)
+    return queryset.filter(id__in=matching).annotate(search_rank=rank)
@@ -1,16 +1,18 @@
 from rest_framework import serializers
 from .models import Category, Product, Cart, CartItem, Wishlist, ProductImage, Order, OrderItem, Payment
 from main.serializers import UserAddressSerializer
+from .images import image_srcset
 
 # ============================================================
 # CATEGORY SERIALIZER
 # ============================================================
 class CategorySerializer(serializers.ModelSerializer):
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Category
-        fields = ["id", "name", "slug", "parent", "image"]
+        fields = ["id", "name", "slug", "parent", "image", "image_srcset"]
 
     def get_image(self, obj):
         request = self.context.get("request")
@@ -18,21 +20,39 @@ class CategorySerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.image.url)
         return None
 
+    def get_image_srcset(self, obj):
+        return image_srcset(obj, self.context.get("request"))
+
 
 # ============================================================
 # PRODUCT IMAGES
 # ============================================================
 class ProductImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
-        fields = ["image"]
+        fields = ["image", "srcset"]
+
+    def get_srcset(self, obj):
+        return image_srcset(obj, self.context.get("request"))
 
 
 # ============================================================
 # PRODUCT SERIALIZER
 # ============================================================
+# Named ?fields= profiles; None means every field
+PRODUCT_PROFILES = {
+    "card": ("id", "name", "slug", "final_price", "discount_percent", "image", "image_srcset"),
+    "detail": None,
+}
+
+
 class ProductSerializer(serializers.ModelSerializer):
+    """Pass `fields=` to render only those fields (the rest are never computed)."""
+
     image = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
     images = ProductImageSerializer(many=True, read_only=True)
     final_price = serializers.SerializerMethodField()
     discount_percent = serializers.SerializerMethodField()
@@ -45,25 +65,32 @@ class ProductSerializer(serializers.ModelSerializer):
             "id", "name", "slug", "description",
             "price", "original_price",
             "final_price", "discount_percent",
-            "brand", "stock", "image", "category",
+            "brand", "stock", "image", "image_srcset", "category",
             "is_trending", "is_top_deal", "images",
            
         ]
 
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
     def get_image(self, obj):
         request = self.context.get("request")
         if request and obj.image:
             return request.build_absolute_uri(obj.image.url)
         return None
 
+    def get_image_srcset(self, obj):
+        return image_srcset(obj, self.context.get("request"))
+
     def get_final_price(self, obj):
         return float(obj.price)
 
     def get_discount_percent(self, obj):
-        if obj.original_price and obj.original_price > obj.price:
-            discount = ((obj.original_price - obj.price) / obj.original_price) * 100
-            return round(discount)
-        return 0
+        # Stored column, computed by the database
+        return obj.discount_percent
     
     
     def get_stock(self, obj):
@@ -79,16 +106,14 @@ class ProductSerializer(serializers.ModelSerializer):
 # CART ITEM SERIALIZER
 # ============================================================
 class CartItemSerializer(serializers.ModelSerializer):
-    product = serializers.SerializerMethodField()
+    # One nested serializer for all rows; reads the prefetched product graph
+    product = ProductSerializer(read_only=True)
     total_price = serializers.SerializerMethodField()
 
     class Meta:
         model = CartItem
         fields = ["id", "product", "quantity", "total_price", "size"]
 
-    def get_product(self, obj):
-        return ProductSerializer(obj.product, context=self.context).data
-
     def get_total_price(self, obj):
         return round(float(obj.product.price) * float(obj.quantity), 2)
 
@@ -109,27 +134,24 @@ class CartSerializer(serializers.ModelSerializer):
             "created_at", "updated_at",
         ]
 
+    # Cart.objects.with_totals() annotation, or one aggregate query
     def get_total_items(self, obj):
-        return sum(item.quantity for item in obj.items.all())
+        return obj.total_items
 
     def get_total_price(self, obj):
-        total = sum(item.product.price * item.quantity for item in obj.items.all())
-        return round(total, 2)
+        return obj.total_price
 
 
 # ============================================================
 # WISHLIST SERIALIZER
 # ============================================================
 class WishlistSerializer(serializers.ModelSerializer):
-    product = serializers.SerializerMethodField()
+    product = ProductSerializer(read_only=True)
 
     class Meta:
         model = Wishlist
         fields = ["id", "product", "added_at"]
 
-    def get_product(self, obj):
-        return ProductSerializer(obj.product, context=self.context).data
-
 
 # ============================================================
 # ORDER ITEM SERIALIZER
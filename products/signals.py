@@ -1,39 +1,98 @@
 # signals.py
 from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Cart, CartItem
+from django.utils import timezone
+from .models import Category, Product, ProductImage, ProductStock
+from . import search
+from .autocomplete import index as autocomplete_index
+from . import images
+from . import carts
 
 
 @receiver(user_logged_in)
 def merge_guest_cart_to_user(sender, user, request, **kwargs):
     """
-    Merge guest cart (if exists) into user's cart after login.
+    Merge the guest cart (cart_code cookie) into the user's cart after a
+    session login; the JWT login calls the same merge directly.
     """
-    session_id = request.session.get("cart_session_id")
-    if not session_id:
-        return
-
-    try:
-        guest_cart = Cart.objects.get(session_id=session_id, user=None)
-    except Cart.DoesNotExist:
-        return
-
-    # Get or create user's cart
-    user_cart, _ = Cart.objects.get_or_create(user=user)
-
-    # Move items from guest cart → user cart
-    for item in guest_cart.items.all():
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=user_cart, product=item.product
-        )
-        if not created:
-            cart_item.quantity += item.quantity
-        else:
-            cart_item.quantity = item.quantity
-        cart_item.save()
-
-    # Delete guest cart after merge
-    guest_cart.delete()
-    request.session.pop("cart_session_id", None)
+    if request is not None:
+        carts.merge_guest_cart(user, request.COOKIES.get("cart_code"))
 
 
+# ============================================================
+# 🔍 FULL-TEXT SEARCH INDEX
+# ============================================================
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        search.index_category(instance.pk)
+
+
+# ============================================================
+# ⌨️ AUTOCOMPLETE PREFIX INDEX
+# ============================================================
+@receiver(post_save, sender=Product)
+def autocomplete_product_saved(sender, instance, **kwargs):
+    autocomplete_index.update_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def autocomplete_product_deleted(sender, instance, **kwargs):
+    autocomplete_index.remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def autocomplete_category_saved(sender, instance, **kwargs):
+    autocomplete_index.update_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def autocomplete_category_deleted(sender, instance, **kwargs):
+    autocomplete_index.remove_category(instance.pk)
+
+
+# ============================================================
+# 🕒 CONDITIONAL GET TIMESTAMPS
+# ============================================================
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductStock)
+@receiver(post_delete, sender=ProductStock)
+def touch_parent_product(sender, instance, **kwargs):
+    # Images / stock are part of the product's representation, so they
+    # move its ETag / Last-Modified and its cached document key too
+    # (update() skips the other signals)
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+# ============================================================
+# 🛒 CART SUMMARIES
+# ============================================================
+@receiver(post_save, sender=Product)
+def invalidate_cart_summaries(sender, instance, created, update_fields=None, **kwargs):
+    # Cached badge totals use the product's price
+    if not created and (update_fields is None or "price" in update_fields):
+        carts.invalidate_product_summaries(instance.pk)
+
+
+# ============================================================
+# 🖼 IMAGE DERIVATIVES
+# ============================================================
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=ProductImage)
+def queue_image_variants(sender, instance, **kwargs):
+    if images.needs_variants(instance):
+        transaction.on_commit(lambda: images.queue_variants(instance))
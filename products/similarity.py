@@ -0,0 +1,166 @@
+"""
+"Similar items" from product content.
+
+``rebuild()`` (``manage.py rebuild_similar_products``) turns the catalog
+into a sparse feature matrix, one row per product:
+
+* every category on the product's id_path (the leaf counts double),
+* brand,
+* price band (log₂ buckets, half weight to the neighbouring bands),
+* name tokens,
+
+Features every product shares are dropped; the rest are IDF-weighted
+and L2-normalised, so a row product is cosine similarity.
+Neighbours are found block by block: one sparse product of
+SIMILAR_PRODUCTS_BLOCK rows against every product, kept sparse, then
+argpartition over each row's non-zero scores. The top
+SIMILAR_PRODUCTS_TOP_K per product are stored in SimilarProduct.
+
+Run ``rebuild_similar_products --if-changed`` on a schedule: it only
+rebuilds when a Product or Category was saved since the last build.
+"""
+import math
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Category, Product, SimilarProduct
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional dependency (batch job only)
+    np = sparse = None
+
+
+TOKEN_RE = re.compile(r"[^\W_]{2,}")
+
+
+def top_k():
+    return getattr(settings, "SIMILAR_PRODUCTS_TOP_K", 12)
+
+
+def neighbours(product_id, limit=None):
+    """[(product_id, score), ...], most similar first."""
+    limit = min(limit or top_k(), top_k())
+    return list(
+        SimilarProduct.objects.filter(product_id=product_id)
+        .order_by("-score", "other_id")
+        .values_list("other_id", "score")[:limit]
+    )
+
+
+def product_features(name, brand, price, id_path):
+    """{feature: weight} for one product."""
+    features = {}
+    categories = [part for part in id_path.split("/") if part]
+    for depth, category_id in enumerate(categories, start=1):
+        features[f"c:{category_id}"] = 2.0 if depth == len(categories) else 1.0
+    if brand:
+        features[f"b:{brand.strip().lower()}"] = 1.0
+    if price and price > 0:
+        band = int(math.log2(float(price)))
+        features[f"p:{band}"] = 1.0
+        features.setdefault(f"p:{band - 1}", 0.5)
+        features.setdefault(f"p:{band + 1}", 0.5)
+    for token in TOKEN_RE.findall((name or "").lower()):
+        features[f"n:{token}"] = 1.0
+    return features
+
+
+def feature_matrix():
+    """(X, product_ids): IDF-weighted, row-normalised CSR feature matrix."""
+    rows = Product.objects.values_list("id", "name", "brand", "price", "category__id_path").order_by("id")
+
+    vocabulary = {}
+    product_ids, indptr, indices, data = [], [0], [], []
+    for product_id, name, brand, price, id_path in rows.iterator(chunk_size=5000):
+        for feature, weight in product_features(name, brand, price, id_path or "").items():
+            indices.append(vocabulary.setdefault(feature, len(vocabulary)))
+            data.append(weight)
+        product_ids.append(product_id)
+        indptr.append(len(indices))
+
+    matrix = sparse.csr_matrix(
+        (np.asarray(data, dtype=np.float32), np.asarray(indices), np.asarray(indptr)),
+        shape=(len(product_ids), len(vocabulary)),
+    )
+
+    # A feature every product has (the shared root category, a price band
+    # covering the whole catalog) can't rank anything, but would make
+    # every pair of products score above zero and every block dense
+    document_frequency = np.bincount(matrix.indices, minlength=matrix.shape[1])
+    informative = document_frequency < matrix.shape[0]
+    matrix = matrix[:, np.flatnonzero(informative)]
+    document_frequency = document_frequency[informative]
+    idf = np.log((1 + matrix.shape[0]) / (1 + document_frequency)).astype(np.float32) + 1
+    matrix = matrix @ sparse.diags(idf)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+    matrix = sparse.diags(1 / norms) @ matrix
+    return matrix.tocsr(), np.asarray(product_ids, dtype=np.int64)
+
+
+def top_similar(matrix, k, block_size):
+    """Yield (rows, columns, scores) arrays of each block's top-k neighbours."""
+    count = matrix.shape[0]
+    k = min(k, count - 1)
+    if k <= 0:
+        return
+
+    transposed = matrix.T.tocsr()
+    for start in range(0, count, block_size):
+        block = (matrix[start:start + block_size] @ transposed).tocsr()
+        rows, columns, scores = [], [], []
+        for offset in range(block.shape[0]):
+            begin, end = block.indptr[offset], block.indptr[offset + 1]
+            row_columns, row_scores = block.indices[begin:end], block.data[begin:end]
+            keep = (row_columns != start + offset) & (row_scores > 0)  # not similar to itself
+            row_columns, row_scores = row_columns[keep], row_scores[keep]
+            if len(row_scores) > k:
+                best = np.argpartition(-row_scores, k - 1)[:k]
+                row_columns, row_scores = row_columns[best], row_scores[best]
+            rows.append(np.full(len(row_scores), start + offset))
+            columns.append(row_columns)
+            scores.append(row_scores)
+        yield np.concatenate(rows), np.concatenate(columns), np.concatenate(scores)
+
+
+def rebuild(batch_size=5000):
+    """Recompute every product's neighbours. Returns rows written."""
+    if np is None:
+        raise ImproperlyConfigured("Rebuilding similar products requires numpy and scipy.")
+
+    built_at = timezone.now()
+    matrix, product_ids = feature_matrix()
+    block_size = getattr(settings, "SIMILAR_PRODUCTS_BLOCK", 1024)
+
+    similar = []
+    for rows, columns, scores in top_similar(matrix, top_k(), block_size):
+        similar.extend(
+            SimilarProduct(product_id=product_id, other_id=other_id, score=score, built_at=built_at)
+            for product_id, other_id, score in zip(
+                product_ids[rows].tolist(), product_ids[columns].tolist(), scores.tolist()
+            )
+        )
+
+    with transaction.atomic():
+        SimilarProduct.objects.all().delete()
+        SimilarProduct.objects.bulk_create(similar, batch_size=batch_size)
+    return len(similar)
+
+
+def catalog_changed():
+    """True when a Product or Category was saved after the last build."""
+    built_at = SimilarProduct.objects.aggregate(built_at=Max("built_at"))["built_at"]
+    if built_at is None:
+        return Product.objects.exists()
+    return (
+        Product.objects.filter(updated_at__gt=built_at).exists()
+        or Category.objects.filter(updated_at__gt=built_at).exists()
+    )
@@ -1,3 +1,1654 @@
-from django.test import TestCase
+import base64
+import json
+import re
+import tempfile
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import DatabaseError, OperationalError, connection
+from django.db.models import F
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import PasswordResetOTP, UserAddress
+
+from . import cooccurrence, images, search, similarity
+from .autocomplete import index as autocomplete_index
+from .carts import add_to_cart, invalidate_summary, merge_guest_cart
+from .cooccurrence import neighbours
+from .documents import product_documents
+from .models import (
+    Cart, CartItem, Category, Order, OrderItem, Payment, Product, ProductCooccurrence, ProductImage, ProductStock,
+    SimilarProduct, TrendingScore, Wishlist, subtree_lookup,
+)
+from .renderers import FastJSONRenderer, msgpack, orjson
+from .serializers import ProductSerializer
+from .trending import TRENDING_ORDERING, trending_queryset, update_scores
+from .views import LISTING_ORDERINGS
+
+
+User = get_user_model()
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Captures EXPLAIN for hot queries and fails when one reads a whole
+    table instead of going through an index. Subclasses seed enough rows
+    in setUpTestData that a sequential scan is never the cheap option.
+    """
+
+    # SQLite: "SCAN products_product" (no "USING ... INDEX"); PostgreSQL: "Seq Scan on ..."
+    FULL_SCAN_PATTERNS = (
+        re.compile(r"\bSCAN (\w+)(?! USING)(?:\s|$)"),
+        re.compile(r"Seq Scan on (\w+)"),
+    )
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed()
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    @classmethod
+    def seed(cls):
+        pass
+
+    def full_table_scans(self, queryset):
+        plan = queryset.explain()
+        return sorted({
+            match.group(1)
+            for pattern in self.FULL_SCAN_PATTERNS
+            for match in pattern.finditer(plan)
+        }), plan
+
+    def assertUsesIndexes(self, queryset):
+        scanned, plan = self.full_table_scans(queryset)
+        self.assertFalse(scanned, f"Full table scan on {', '.join(scanned)}:\n{plan}")
+
+
+class CatalogQueryPlanTests(QueryPlanTestCase):
+
+    @classmethod
+    def seed(cls):
+        roots = Category.objects.bulk_create(
+            Category(name=f"Root {i}", slug=f"root-{i}") for i in range(20)
+        )
+        children = Category.objects.bulk_create(
+            Category(name=f"Child {i}", slug=f"child-{i}", parent=roots[i % len(roots)])
+            for i in range(200)
+        )
+        Category.rebuild_paths()
+
+        Product.objects.bulk_create(
+            Product(
+                name=f"Product {i}",
+                slug=f"product-{i}",
+                price=Decimal(100 + i % 5000),
+                original_price=Decimal(200 + i % 5000),
+                brand=f"Brand {i % 300}",
+                category=children[i % len(children)],
+                is_trending=i % 97 == 0,
+                is_top_deal=i % 89 == 0,
+            )
+            for i in range(5000)
+        )
+        TrendingScore.objects.bulk_create(
+            TrendingScore(product=product, score=(product.pk * 7919) % 1000)
+            for product in Product.objects.all()[:3000]
+        )
+        ids = list(Product.objects.values_list("id", flat=True)[:1000])
+        ProductCooccurrence.objects.bulk_create(
+            ProductCooccurrence(product_id=a, other_id=ids[(i + step) % len(ids)], count=step)
+            for i, a in enumerate(ids)
+            for step in range(1, 31)
+        )
+        cls.category = Category.objects.get(slug="root-3")
+
+    def test_detects_full_scan(self):
+        scanned, _ = self.full_table_scans(Product.objects.filter(description="x"))
+        self.assertEqual(scanned, ["products_product"])
+
+    def test_category_roots(self):
+        self.assertUsesIndexes(Category.objects.filter(parent=None))
+
+    def test_category_path_lookup(self):
+        self.assertUsesIndexes(Category.objects.filter(slug_path="root-3/child-3"))
+
+    def test_products_by_category_subtree(self):
+        self.assertUsesIndexes(
+            Product.objects.filter(**subtree_lookup(self.category.id_path, through="category__"))
+        )
+
+    def test_trending_products(self):
+        self.assertUsesIndexes(Product.objects.filter(is_trending=True))
+
+    def test_top_deals_products(self):
+        self.assertUsesIndexes(Product.objects.filter(is_top_deal=True))
+
+    def test_trending_ranking(self):
+        self.assertUsesIndexes(trending_queryset().order_by(*TRENDING_ORDERING))
+
+    def test_bought_together(self):
+        product_id = Product.objects.order_by("id").first().pk
+        with self.assertNumQueries(1):
+            self.assertEqual(len(neighbours(product_id)), 20)
+        self.assertUsesIndexes(
+            ProductCooccurrence.objects.filter(product_id=product_id).order_by("-count", "other_id")[:20]
+        )
+
+    def test_price_range(self):
+        self.assertUsesIndexes(Product.objects.filter(price__gte=1000, price__lte=1200))
+
+    def test_brand_facet_lookup(self):
+        self.assertUsesIndexes(Product.objects.filter(brand="Brand 7"))
+
+    def test_order_by_discount(self):
+        self.assertUsesIndexes(Product.objects.order_by("-discount_percent", "id")[:24])
+
+
+class CartQueryPlanTests(QueryPlanTestCase):
+
+    @classmethod
+    def seed(cls):
+        category = Category.objects.create(name="Root", slug="root")
+        products = Product.objects.bulk_create(
+            Product(name=f"Product {i}", slug=f"product-{i}", price=Decimal(100), category=category)
+            for i in range(500)
+        )
+        users = User.objects.bulk_create(
+            User(email=f"user{i}@example.com", phone=f"{9000000000 + i}") for i in range(2000)
+        )
+        carts = Cart.objects.bulk_create(
+            [Cart(user=user, cart_code=f"user-{user.pk}", paid=False) for user in users]
+            + [Cart(cart_code=f"guest-{i}", paid=i % 3 == 0) for i in range(3000)]
+        )
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=products[i % len(products)], size="M")
+            for i, cart in enumerate(carts)
+        )
+        Wishlist.objects.bulk_create(
+            Wishlist(user=user, product=products[i % len(products)]) for i, user in enumerate(users)
+        )
+        Order.objects.bulk_create(
+            Order(user=user, order_id=f"order-{i}", total_amount=Decimal(100))
+            for i, user in enumerate(users)
+        )
+        cls.user = users[42]
+
+    def test_user_cart(self):
+        self.assertUsesIndexes(Cart.objects.filter(user=self.user, paid=False))
+
+    def test_guest_cart(self):
+        self.assertUsesIndexes(Cart.objects.filter(cart_code="guest-17", paid=False))
+
+    def test_product_in_cart(self):
+        cart = Cart.objects.get(cart_code="guest-17")
+        self.assertUsesIndexes(CartItem.objects.filter(cart=cart, product_id=17))
+
+    def test_wishlist(self):
+        self.assertUsesIndexes(Wishlist.objects.filter(user=self.user))
+
+    def test_user_orders(self):
+        self.assertUsesIndexes(Order.objects.filter(user=self.user).order_by("-created_at"))
+
+
+class CartTotalsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Root", slug="root")
+        cls.cart = Cart.objects.create(cart_code="totals")
+        for i, (price, quantity) in enumerate([("199.99", 2), ("0.10", 3), ("1250.00", 1)]):
+            product = Product.objects.create(
+                name=f"Product {i}", slug=f"product-{i}", price=Decimal(price), category=category
+            )
+            CartItem.objects.create(cart=cls.cart, product=product, quantity=quantity, size="M")
+        Cart.objects.create(cart_code="empty")
+
+    def test_annotated_totals(self):
+        with self.assertNumQueries(1):
+            carts = {cart.cart_code: cart for cart in Cart.objects.with_totals()}
+            self.assertEqual(carts["totals"].total_items, 6)
+            self.assertEqual(carts["totals"].total_price, Decimal("1650.28"))
+            self.assertEqual(carts["empty"].total_items, 0)
+            self.assertEqual(carts["empty"].total_price, Decimal("0"))
+
+    def test_totals_without_annotation(self):
+        cart = Cart.objects.get(pk=self.cart.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(cart.total_price, Decimal("1650.28"))
+            self.assertEqual(cart.total_items, 6)
+        self.assertIsInstance(cart.total_price, Decimal)
+
+
+class AddToCartConcurrencyTests(TransactionTestCase):
+    """Many simultaneous adds of the same line must all be counted."""
+
+    THREADS = 8
+    ADDS_PER_THREAD = 25
+
+    def setUp(self):
+        category = Category.objects.create(name="Root", slug="root")
+        self.product = Product.objects.create(name="Tee", slug="tee", price=Decimal(100), category=category)
+        self.cart = Cart.objects.create(cart_code="stress")
+
+    def add_many(self, size):
+        try:
+            for _ in range(self.ADDS_PER_THREAD):
+                while True:
+                    try:
+                        add_to_cart(self.cart.pk, self.product.pk, 1, size)
+                        break
+                    except OperationalError:  # SQLite "table is locked": the write didn't happen
+                        continue
+        finally:
+            connection.close()
+
+    def test_no_lost_increments(self):
+        for size in ("M", None):
+            with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+                list(pool.map(self.add_many, [size] * self.THREADS))
+
+        lines = dict(CartItem.objects.filter(cart=self.cart).values_list("size", "quantity"))
+        expected = self.THREADS * self.ADDS_PER_THREAD
+        self.assertEqual(lines, {"M": expected, "": expected})
+
+    def test_returns_running_quantity(self):
+        first_id, first = add_to_cart(self.cart.pk, self.product.pk, 2, "L")
+        second_id, second = add_to_cart(self.cart.pk, self.product.pk, 3, " L ")
+        self.assertEqual((first, second), (2, 5))
+        self.assertEqual(first_id, second_id)
+
+
+class CartBatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Root", slug="root")
+        cls.products = Product.objects.bulk_create(
+            Product(name=f"Product {i}", slug=f"product-{i}", price=Decimal(10 * (i + 1)), category=category)
+            for i in range(4)
+        )
+        cls.cart = Cart.objects.create(cart_code="batch")
+        CartItem.objects.bulk_create([
+            CartItem(cart=cls.cart, product=cls.products[0], size="M", quantity=1),
+            CartItem(cart=cls.cart, product=cls.products[1], quantity=4),
+        ])
+
+    def post(self, operations):
+        return self.client.post(
+            reverse("cart-batch"),
+            {"cart_code": "batch", "operations": operations},
+            content_type="application/json",
+            HTTP_ACCEPT="application/json",
+        )
+
+    def lines(self):
+        return dict(
+            ((product_id, size), quantity)
+            for product_id, size, quantity in self.cart.items.values_list("product_id", "size", "quantity")
+        )
+
+    def test_add_set_remove(self):
+        first, second, third, fourth = (product.pk for product in self.products)
+        response = self.post([
+            {"op": "add", "product_id": first, "quantity": 2, "size": "M"},
+            {"op": "set", "product_id": second, "quantity": 0},
+            {"op": "add", "product_id": third},
+            {"op": "add", "product_id": third, "quantity": 2},
+            {"op": "remove", "product_id": fourth, "size": "L"},
+            {"op": "add", "product_id": fourth, "size": "L"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.lines(), {(first, "M"): 3, (third, ""): 3, (fourth, "L"): 1})
+        self.assertEqual(response.json()["total_items"], 7)
+        self.assertEqual(Decimal(str(response.json()["total_price"])), Decimal("160"))
+
+    def test_unknown_product_changes_nothing(self):
+        response = self.post([
+            {"op": "set", "product_id": self.products[0].pk, "quantity": 9, "size": "M"},
+            {"op": "add", "product_id": 999999},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("999999", response.json()["error"])
+        self.assertEqual(self.lines()[(self.products[0].pk, "M")], 1)
+
+    def test_rejects_bad_operation(self):
+        response = self.post([{"op": "set", "product_id": self.products[0].pk}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_out_of_range_values(self):
+        product_id = self.products[0].pk
+        for operations, error in (
+            ([{"op": "add", "product_id": 10 ** 20}], "operations[0]: invalid product_id"),
+            ([{"op": "add", "product_id": 0}], "operations[0]: invalid product_id"),
+            ([{"op": "add", "product_id": product_id, "size": "X" * 21}], "operations[0]: size is longer"),
+            ([{"op": "set", "product_id": product_id, "quantity": 1000}], "operations[0]: at most 999"),
+            (
+                [{"op": "add", "product_id": product_id}, {"op": "add", "product_id": product_id, "quantity": 999}],
+                "operations[1]: at most 999",
+            ),
+        ):
+            response = self.post(operations)
+            self.assertEqual(response.status_code, 400, operations)
+            self.assertTrue(response.json()["error"].startswith(error), response.json())
+        self.assertEqual(self.lines()[(product_id, "M")], 1)
+
+    def test_rejects_non_object_body(self):
+        response = self.client.post(
+            reverse("cart-batch"), [1, 2], content_type="application/json", HTTP_ACCEPT="application/json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_batch_creates_no_cart(self):
+        for operations in ([{"op": "add"}], [{"op": "add", "product_id": 999999}]):
+            response = self.client.post(
+                reverse("cart-batch"),
+                {"cart_code": "fresh", "operations": operations},
+                content_type="application/json",
+                HTTP_ACCEPT="application/json",
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertFalse(Cart.objects.filter(cart_code="fresh").exists())
+
+
+class GuestCartMergeTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Root", slug="root")
+        cls.first, cls.second = Product.objects.bulk_create(
+            Product(name=f"Product {i}", slug=f"product-{i}", price=Decimal(100), category=category)
+            for i in range(2)
+        )
+        cls.user = User.objects.create(email="shopper@example.com", phone="9000000001")
+
+    def test_merges_quantities_and_deletes_guest_cart(self):
+        user_cart = Cart.objects.create(user=self.user, cart_code="mine")
+        CartItem.objects.create(cart=user_cart, product=self.first, size="M", quantity=3)
+        guest = Cart.objects.create(cart_code="guest")
+        CartItem.objects.bulk_create([
+            CartItem(cart=guest, product=self.first, size="M", quantity=2),
+            CartItem(cart=guest, product=self.second, quantity=1),
+        ])
+
+        self.assertEqual(merge_guest_cart(self.user, "guest"), user_cart)
+        self.assertEqual(
+            set(user_cart.items.values_list("product_id", "size", "quantity")),
+            {(self.first.pk, "M", 5), (self.second.pk, "", 1)},
+        )
+        self.assertFalse(Cart.objects.filter(pk=guest.pk).exists())
+
+    def test_ignores_other_users_carts(self):
+        other = User.objects.create(email="other@example.com", phone="9000000002")
+        cart = Cart.objects.create(user=other, cart_code="theirs")
+        CartItem.objects.create(cart=cart, product=self.first, quantity=1)
+
+        self.assertIsNone(merge_guest_cart(self.user, "theirs"))
+        self.assertEqual(cart.items.count(), 1)
+
+
+class DeferredGuestCartTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Root", slug="root")
+        cls.product = Product.objects.create(name="Tee", slug="tee", price=Decimal(100), category=category)
+
+    def test_empty_guest_cart_is_not_written(self):
+        response = self.client.get(reverse("get-cart"), HTTP_ACCEPT="application/json")
+        cart_code = response.cookies["cart_code"].value
+        self.assertEqual(response.json()["cart_code"], cart_code)
+        self.assertEqual(response.json()["items"], [])
+        self.assertFalse(Cart.objects.exists())
+
+        stat = self.client.get(reverse("get-cart-stat"), {"cart_code": cart_code}, HTTP_ACCEPT="application/json")
+        self.assertEqual(stat.json()["total_items"], 0)
+        check = self.client.get(
+            reverse("product-in-cart"), {"cart_code": cart_code, "product_id": self.product.pk},
+            HTTP_ACCEPT="application/json",
+        )
+        self.assertFalse(check.json()["product_in_cart"])
+        self.assertFalse(Cart.objects.exists())
+
+    def test_first_item_creates_the_cart(self):
+        cart_code = self.client.get(reverse("get-cart")).cookies["cart_code"].value
+        self.client.post(
+            reverse("add-to-cart"), {"cart_code": cart_code, "product_id": self.product.pk},
+            content_type="application/json",
+        )
+        response = self.client.get(reverse("get-cart"), HTTP_ACCEPT="application/json")
+        self.assertEqual(Cart.objects.get().cart_code, cart_code)
+        self.assertEqual(response.json()["total_items"], 1)
+
+
+class PurgeStaleDataTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Root", slug="root")
+        product = Product.objects.create(name="Tee", slug="tee", price=Decimal(100), category=category)
+        user = User.objects.create(email="shopper@example.com", phone="9000000001")
+        long_ago = timezone.now() - timedelta(days=90)
+
+        carts = Cart.objects.bulk_create([
+            Cart(cart_code=f"old-guest-{i}") for i in range(5)
+        ] + [
+            Cart(cart_code="fresh-guest"),
+            Cart(cart_code="revived-guest"),
+            Cart(cart_code="old-user", user=user),
+            Cart(cart_code="old-paid", paid=True),
+        ])
+        CartItem.objects.bulk_create(CartItem(cart=cart, product=product) for cart in carts[:5])
+        revived = CartItem.objects.create(cart=carts[6], product=product)
+        Cart.objects.exclude(cart_code="fresh-guest").update(updated_at=long_ago)
+        CartItem.objects.exclude(pk=revived.pk).update(added_at=long_ago)
+
+        PasswordResetOTP.objects.create(email="a@example.com", otp="123456")
+        PasswordResetOTP.objects.create(email="b@example.com", otp="654321")
+        PasswordResetOTP.objects.filter(email="a@example.com").update(created_at=long_ago)
+
+    def test_purges_only_stale_rows(self):
+        out = StringIO()
+        call_command("purge_stale_data", batch_size=2, stdout=out)
+
+        self.assertEqual(
+            set(Cart.objects.values_list("cart_code", flat=True)),
+            {"fresh-guest", "revived-guest", "old-user"},
+        )
+        self.assertEqual(CartItem.objects.count(), 1)
+        self.assertEqual(list(PasswordResetOTP.objects.values_list("email", flat=True)), ["b@example.com"])
+        self.assertIn("guest carts: 5 deleted (10 rows with related)", out.getvalue())
+
+    def test_dry_run_deletes_nothing(self):
+        call_command("purge_stale_data", dry_run=True, stdout=StringIO())
+        self.assertEqual(Cart.objects.count(), 9)
+
+
+class CartSummaryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Root", slug="root")
+        cls.product = Product.objects.create(name="Tee", slug="tee", price=Decimal("249.50"), category=category)
+
+    def setUp(self):
+        cache.clear()
+
+    def summary(self, cart_code):
+        response = self.client.get(reverse("cart-summary"), {"cart_code": cart_code}, HTTP_ACCEPT="application/json")
+        return response.json()["total_items"], Decimal(str(response.json()["total_price"]))
+
+    def test_cached_after_first_read(self):
+        self.assertEqual(self.summary("badge"), (0, Decimal("0")))
+        with self.assertNumQueries(0):
+            self.summary("badge")
+
+    def write(self, method, name, data):
+        # invalidation runs on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            getattr(self.client, method)(reverse(name), data, content_type="application/json")
+
+    def test_every_write_path_refreshes_it(self):
+        self.summary("badge")
+        self.write("post", "add-to-cart", {"cart_code": "badge", "product_id": self.product.pk, "quantity": 2})
+        self.assertEqual(self.summary("badge"), (2, Decimal("499.00")))
+
+        item = CartItem.objects.get()
+        self.write("patch", "update-quantity", {"item_id": item.pk, "quantity": 3})
+        self.assertEqual(self.summary("badge"), (3, Decimal("748.50")))
+
+        self.write("post", "cart-batch", {"cart_code": "badge", "operations": [{"op": "add", "product_id": self.product.pk}]})
+        self.assertEqual(self.summary("badge")[0], 4)
+
+        self.write("post", "delete-cartitem", {"item_id": item.pk})
+        self.assertEqual(self.summary("badge"), (0, Decimal("0")))
+
+    def test_write_during_a_miss_is_not_cached_stale(self):
+        cart = Cart.objects.create(cart_code="badge")
+        real_set = cache.set
+
+        def set_after_a_write(key, value, timeout=None, **kwargs):
+            if isinstance(value, dict) and "total_items" in value:
+                # A write commits between the reader's aggregate and its cache.set
+                with self.captureOnCommitCallbacks(execute=True):
+                    add_to_cart(cart.pk, self.product.pk, 2)
+                    invalidate_summary(cart)
+            real_set(key, value, timeout, **kwargs)
+
+        with mock.patch("products.carts.cache.set", side_effect=set_after_a_write):
+            self.assertEqual(self.summary("badge"), (0, Decimal("0")))
+        self.assertEqual(self.summary("badge"), (2, Decimal("499.00")))
+
+    def test_price_change_refreshes_it(self):
+        cart = Cart.objects.create(cart_code="badge")
+        add_to_cart(cart.pk, self.product.pk, 2)
+        self.assertEqual(self.summary("badge"), (2, Decimal("499.00")))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.price = Decimal("200.00")
+            self.product.save()
+        self.assertEqual(self.summary("badge"), (2, Decimal("400.00")))
+
+    def test_failed_write_keeps_it(self):
+        cart = Cart.objects.create(cart_code="badge")
+        item = CartItem.objects.create(cart=cart, product=self.product, quantity=1)
+        with mock.patch.object(CartItem, "save", side_effect=DatabaseError), \
+                mock.patch("products.carts.invalidate_summary") as invalidate:
+            self.write("patch", "update-quantity", {"item_id": item.pk, "quantity": 3})
+        invalidate.assert_not_called()
+
+
+class CategoryPathTests(TestCase):
+
+    def setUp(self):
+        self.men = Category.objects.create(name="Men", slug="men")
+        self.women = Category.objects.create(name="Women", slug="women")
+        self.shirts = Category.objects.create(name="Shirts", slug="shirts", parent=self.men)
+        self.formal = Category.objects.create(name="Formal", slug="formal", parent=self.shirts)
+
+    def paths(self, category):
+        category.refresh_from_db()
+        return category.slug_path, category.id_path
+
+    def test_paths_on_create(self):
+        self.assertEqual(self.paths(self.formal), (
+            "men/shirts/formal", f"/{self.men.pk}/{self.shirts.pk}/{self.formal.pk}/",
+        ))
+
+    def test_rename_rewrites_descendants(self):
+        self.men.slug = "gents"
+        self.men.save()
+        self.assertEqual(self.paths(self.shirts)[0], "gents/shirts")
+        self.assertEqual(self.paths(self.formal)[0], "gents/shirts/formal")
+        self.assertEqual(self.paths(self.women)[0], "women")
+
+    def test_reparent_rewrites_descendants(self):
+        self.shirts.parent = self.women
+        self.shirts.save()
+        self.assertEqual(self.paths(self.shirts), ("women/shirts", f"/{self.women.pk}/{self.shirts.pk}/"))
+        self.assertEqual(self.paths(self.formal), (
+            "women/shirts/formal", f"/{self.women.pk}/{self.shirts.pk}/{self.formal.pk}/",
+        ))
+        self.assertEqual(
+            set(self.women.get_descendants().values_list("slug", flat=True)),
+            {"women", "shirts", "formal"},
+        )
+        self.assertEqual(list(self.men.get_descendants().values_list("slug", flat=True)), ["men"])
+
+    def test_subtree_lookup_is_an_exact_prefix(self):
+        paths = ["/1/", "/1/5/", "/1/5/7/", "/1/50/", "/1/5", "/10/", "/2/1/5/"]
+        for category, path in zip(Category.objects.bulk_create(
+            Category(name=path, slug=f"c{i}") for i, path in enumerate(paths)
+        ), paths):
+            Category.objects.filter(pk=category.pk).update(id_path=path)
+        self.assertEqual(
+            sorted(
+                Category.objects.filter(name__in=paths, **subtree_lookup("/1/5/"))
+                .values_list("id_path", flat=True)
+            ),
+            ["/1/5/", "/1/5/7/"],
+        )
+
+    def test_rebuild_paths_repairs_the_tree(self):
+        Category.objects.update(slug_path="", id_path="")
+        self.assertEqual(Category.rebuild_paths(), 4)
+        self.assertEqual(self.paths(self.formal), (
+            "men/shirts/formal", f"/{self.men.pk}/{self.shirts.pk}/{self.formal.pk}/",
+        ))
+        self.assertEqual(Category.rebuild_paths(), 0)
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Men", slug="men")
+        Product.objects.bulk_create(
+            Product(
+                name=f"Product {i}",
+                slug=f"product-{i}",
+                price=Decimal(100 + i % 4 * 50),           # ties across pages
+                original_price=Decimal(300) if i % 3 else None,
+                rating=i % 5,
+                category=cls.category,
+            )
+            for i in range(23)
+        )
+
+    def get(self, url, **params):
+        return self.client.get(url, params, HTTP_ACCEPT="application/json")
+
+    def walk(self, **params):
+        """Follow `next` links from the first page; returns the ids in order."""
+        ids, url = [], reverse("products-by-category", args=["men"])
+        params = {"page_size": 5, "fields": "id", **params}
+        while url:
+            response = self.get(url, **params)
+            self.assertEqual(response.status_code, 200)
+            ids += [product["id"] for product in response.json()["results"]]
+            url, params = response.json()["next"], {}
+        return ids
+
+    def test_pages_chain_without_gaps_or_repeats(self):
+        self.assertEqual(self.walk(), list(Product.objects.order_by("id").values_list("id", flat=True)))
+
+    def test_every_listing_ordering(self):
+        for name, ordering in LISTING_ORDERINGS.items():
+            with self.subTest(ordering=name):
+                expected = list(Product.objects.order_by(*ordering).values_list("id", flat=True))
+                self.assertEqual(self.walk(ordering=name), expected)
+
+    def test_invalid_cursors(self):
+        def cursor(token):
+            raw = token if isinstance(token, bytes) else json.dumps(token).encode()
+            return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+        url = reverse("products-by-category", args=["men"])
+        for token in (
+            b"not json",
+            {"o": ["id"], "v": ["abc"]},
+            {"o": ["id"], "v": [None]},
+            {"o": ["id"], "v": [[1, 2]]},
+            {"o": ["id"], "v": []},
+            {"o": ["price", "id"], "v": ["cheap", 1]},
+            {"o": ["-price", "-id"], "v": [{"a": 1}, 1]},
+        ):
+            with self.subTest(token=token):
+                response = self.get(url, cursor=cursor(token))
+                self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.get(url, cursor="%%%").status_code, 404)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tops", slug="tops")
+        cls.title_match = Product.objects.create(
+            name="Linen shirt", slug="linen-shirt", price=Decimal(900), brand="Loom", category=category,
+        )
+        cls.description_match = Product.objects.create(
+            name="Summer kurta", slug="summer-kurta", price=Decimal(700), brand="Loom",
+            description="Pairs well with a shirt", category=category,
+        )
+        Product.objects.bulk_create(
+            Product(
+                name=f"Oxford shirt {i}", slug=f"oxford-shirt-{i}", price=Decimal(500 + i),
+                brand="Weaver", category=category,
+            )
+            for i in range(40)
+        )
+        search.rebuild()  # bulk_create skips the indexing signal
+        # Weakest possible match (description only), far down the ranking
+        cls.acme = Product.objects.create(
+            name="Belt", slug="belt", price=Decimal(300), brand="Acme",
+            description="Goes with any shirt " + "filler " * 50, category=category,
+        )
+
+    def search(self, **params):
+        response = self.client.get(reverse("search-products"), params, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ranks_name_matches_first(self):
+        ids = [product["id"] for product in self.search(q="shirt", fields="id")]
+        self.assertEqual(len(ids), 43)
+        self.assertLess(ids.index(self.title_match.pk), ids.index(self.description_match.pk))
+        self.assertEqual(ids[-1], self.acme.pk)
+
+    def test_prefix_and_every_word(self):
+        ids = [product["id"] for product in self.search(q="lin shi", fields="id")]
+        self.assertEqual(ids, [self.title_match.pk])
+
+    def test_punctuation_only_query_is_empty(self):
+        for query in ("!!!", "-", "_"):
+            self.assertEqual(self.search(q=query, fields="id"), [])
+
+    def test_filters_apply_to_every_match(self):
+        results = self.search(q="shirt", brand="Acme", fields="id")
+        self.assertEqual([product["id"] for product in results], [self.acme.pk])
+
+        results = self.search(q="shirt", min_price=300, max_price=600, fields="id", facets="brand")
+        self.assertEqual(
+            {row["brand"]: row["count"] for row in results["facets"]["brand"]},
+            {"Weaver": 40, "Acme": 1},
+        )
+
+    def test_pages_follow_the_ranking(self):
+        expected = [product["id"] for product in self.search(q="shirt", fields="id")]
+        ids, params = [], {"q": "shirt", "fields": "id", "page_size": 10}
+        url = reverse("search-products")
+        while url:
+            page = self.client.get(url, params, HTTP_ACCEPT="application/json").json()
+            ids += [product["id"] for product in page["results"]]
+            url, params = page["next"], {}
+        self.assertEqual(ids, expected)
+
+
+class ProductDocumentCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tops", slug="tops")
+        cls.product = Product.objects.create(name="Tee", slug="tee", price=Decimal(100), category=category)
+
+    def setUp(self):
+        cache.clear()
+
+    def document(self):
+        response = self.client.get(reverse("product-batch"), {"ids": self.product.pk}, HTTP_ACCEPT="application/json")
+        return response.json()["results"][0]
+
+    def test_served_from_cache(self):
+        self.document()
+        # Batch lookup + nothing else: no prefetches for a cached document
+        with self.assertNumQueries(1):
+            self.document()
+
+    def test_product_edit_from_another_process(self):
+        self.document()
+        # update() skips every signal, like a write from another worker would
+        Product.objects.filter(pk=self.product.pk).update(name="Polo", updated_at=timezone.now())
+        self.assertEqual(self.document()["name"], "Polo")
+
+    def test_image_change(self):
+        self.assertEqual(self.document()["images"], [])
+        ProductImage.objects.create(product=self.product, image="products/gallery/tee.jpg")
+        self.assertEqual(len(self.document()["images"]), 1)
+
+    def test_stock_change(self):
+        self.document()
+        stock = ProductStock.objects.create(product=self.product, size="M", quantity=4)
+        self.assertEqual(self.document()["stock"], [{"size": "M", "quantity": 4}])
+        stock.quantity = 0
+        stock.save()
+        self.assertEqual(self.document()["stock"], [{"size": "M", "quantity": 0}])
+        stock.delete()
+        self.assertEqual(self.document()["stock"], [])
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Tops", slug="tops")
+        cls.product = Product.objects.create(name="Tee", slug="tee", price=Decimal(100), category=cls.category)
+
+    def get(self, url, **headers):
+        return self.client.get(url, HTTP_ACCEPT="application/json", **headers)
+
+    def detail_url(self):
+        return reverse("product-detail", args=[self.product.pk, self.product.slug])
+
+    def test_matching_etag_is_304_without_serializing(self):
+        # validator aggregate only (+ resolving the category path)
+        for url, queries in ((self.detail_url(), 1), (reverse("products-by-category", args=["tops"]), 2)):
+            with self.subTest(url=url):
+                etag = self.get(url)["ETag"]
+                with mock.patch.object(ProductSerializer, "to_representation") as serialize:
+                    with self.assertNumQueries(queries):
+                        response = self.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                serialize.assert_not_called()
+
+    def test_image_and_stock_changes_move_the_etag(self):
+        etags = [self.get(self.detail_url())["ETag"]]
+
+        image = ProductImage.objects.create(product=self.product, image="products/gallery/tee.jpg")
+        etags.append(self.get(self.detail_url())["ETag"])
+        stock = ProductStock.objects.create(product=self.product, size="M", quantity=3)
+        etags.append(self.get(self.detail_url())["ETag"])
+        stock.quantity = 1
+        stock.save()
+        etags.append(self.get(self.detail_url())["ETag"])
+        image.delete()
+        etags.append(self.get(self.detail_url())["ETag"])
+
+        self.assertEqual(len(set(etags)), len(etags))
+        response = self.get(self.detail_url(), HTTP_IF_NONE_MATCH=etags[0])
+        self.assertEqual(response.status_code, 200)
+
+
+class ProductFieldSelectionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tops", slug="tops")
+        cls.product = Product.objects.create(name="Tee", slug="tee", price=Decimal(100), category=category)
+        ProductStock.objects.create(product=cls.product, size="M", quantity=2)
+
+    def setUp(self):
+        cache.clear()
+
+    def documents(self, fields):
+        return product_documents(Product.objects.filter(pk=self.product.pk), None, fields)
+
+    def test_custom_fields_prefetch_only_what_they_read(self):
+        pk = self.product.pk
+        with self.assertNumQueries(1):  # the products themselves
+            documents = self.documents(("id", "price", "brand"))
+        self.assertEqual(documents, [{"id": pk, "price": "100.00", "brand": None}])
+
+        with self.assertNumQueries(2):  # + stock, never images
+            documents = self.documents(("id", "stock"))
+        self.assertEqual(documents, [{"id": pk, "stock": [{"size": "M", "quantity": 2}]}])
+
+    def test_custom_fields_are_not_cached(self):
+        with mock.patch("products.documents.cache") as document_cache:
+            self.documents(("id", "price", "brand"))
+        document_cache.get_many.assert_not_called()
+        document_cache.set_many.assert_not_called()
+
+
+@skipUnless(orjson, "orjson is not installed")
+class FastJSONRendererTests(SimpleTestCase):
+
+    def render(self, data, **context):
+        return FastJSONRenderer().render(data, "application/json", context), \
+            JSONRenderer().render(data, "application/json", context)
+
+    def test_same_bytes_as_json_renderer(self):
+        payload = {
+            "id": 7, "big": 2 ** 70, "ok": True, "none": None, "name": "Kurta – “naïve” 🧵",
+            "separators": "a\u2028b\u2029c", "price": Decimal("1299.50"), "rating": 4.25, "tiny": 0.0001,
+            "created": datetime(2026, 1, 2, 3, 4, 5, 678900, tzinfo=dt_timezone.utc),
+            "day": date(2026, 1, 2), "at": time(9, 30), "token": uuid.UUID(int=1),
+            "label": gettext_lazy("Cart"), "pair": (1, 2), 3: "int key",
+            "results": [{"id": i, "final_price": i * 10.5, "images": []} for i in range(3)],
+        }
+        fast, reference = self.render(payload)
+        self.assertEqual(fast, reference)
+
+    def test_documented_float_differences(self):
+        fast, reference = self.render([1e16, 1e-05])
+        self.assertEqual((fast, reference), (b"[1e16,0.00001]", b"[1e+16,1e-05]"))
+        self.assertEqual(json.loads(fast), json.loads(reference))
+
+        self.assertEqual(FastJSONRenderer().render([float("nan")]), b"[null]")
+        with self.assertRaises(ValueError):
+            JSONRenderer().render([float("nan")])
+
+    def test_indented_output_falls_back(self):
+        fast, reference = self.render({"a": [1, 2]}, indent=2)
+        self.assertEqual(fast, reference)
+
+
+@override_settings(
+    TRENDING_HALF_LIFE_HOURS=10,
+    TRENDING_WEIGHTS={"order_item": 3.0, "wishlist": 2.0, "cart_item": 1.0},
+    TRENDING_GRACE_SECONDS=300,
+)
+class TrendingScoreTests(TestCase):
+    NOW = datetime(2026, 10, 1, 12, 0, tzinfo=dt_timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tops", slug="tops")
+        cls.tee, cls.polo = Product.objects.bulk_create(
+            Product(name=name, slug=name.lower(), price=Decimal(100), category=category)
+            for name in ("Tee", "Polo")
+        )
+        cls.user = User.objects.create(email="shopper@example.com", phone="9000000001")
+        cls.cart = Cart.objects.create(cart_code="trend")
+
+    def at(self, row, when):
+        type(row).objects.filter(pk=row.pk).update(**{
+            "created_at" if isinstance(row, Order) else "added_at": when,
+        })
+        return row
+
+    def cart_add(self, product, when):
+        return self.at(CartItem.objects.create(cart=self.cart, product=product, size=str(when)), when)
+
+    def scores(self):
+        return {
+            product_id: round(score, 6)
+            for product_id, score in TrendingScore.objects.values_list("product_id", "score")
+        }
+
+    def test_weights_decay_and_fold_in(self):
+        ten_hours_ago = self.NOW - timedelta(hours=10)
+        order = self.at(Order.objects.create(user=self.user, order_id="o-1", total_amount=Decimal(200)), ten_hours_ago)
+        OrderItem.objects.create(order=order, product=self.tee, quantity=2, price=Decimal(100))
+        self.at(Wishlist.objects.create(user=self.user, product=self.polo), self.NOW - timedelta(hours=1))
+        self.cart_add(self.polo, self.NOW - timedelta(hours=1))
+
+        self.assertEqual(update_scores(self.NOW), 2)
+        # tee: 3 × 2 units, one half-life old; polo: (2 + 1) × ½^(1/10)
+        self.assertEqual(self.scores(), {self.tee.pk: 3.0, self.polo.pk: round(3 * 0.5 ** 0.1, 6)})
+
+        # Ten hours later everything has halved, and the new add is folded in
+        later = self.NOW + timedelta(hours=10)
+        self.cart_add(self.tee, later - timedelta(hours=1))
+        update_scores(later)
+        self.assertEqual(self.scores(), {
+            self.tee.pk: round(1.5 + 0.5 ** 0.1, 6),
+            self.polo.pk: round(1.5 * 0.5 ** 0.1, 6),
+        })
+
+        # Nothing new: a rerun only decays (here by nothing)
+        update_scores(later)
+        self.assertEqual(self.scores()[self.tee.pk], round(1.5 + 0.5 ** 0.1, 6))
+
+    def test_late_commit_with_lower_id_is_not_skipped(self):
+        self.cart_add(self.tee, self.NOW - timedelta(hours=2))
+        gap = CartItem.objects.create(cart=self.cart, product=self.polo, size="gap")
+        gap_id = gap.pk
+        gap.delete()
+        # Committed just before the run, so within the grace period
+        self.cart_add(self.tee, self.NOW - timedelta(seconds=30))
+
+        update_scores(self.NOW)
+        self.assertEqual(self.scores(), {self.tee.pk: round(0.5 ** 0.2, 6)})
+
+        # A transaction that got its id before the last row commits only now
+        late = CartItem.objects.create(id=gap_id, cart=self.cart, product=self.polo, size="late")
+        self.at(late, self.NOW - timedelta(minutes=2))
+
+        later = self.NOW + timedelta(minutes=10)
+        update_scores(later)
+        self.assertIn(self.polo.pk, self.scores())
+
+
+@skipUnless(similarity.np, "numpy / scipy are not installed")
+@override_settings(SIMILAR_PRODUCTS_TOP_K=5, SIMILAR_PRODUCTS_BLOCK=2)
+class SimilarProductsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tops = Category.objects.create(name="Tops", slug="tops")
+        shoes = Category.objects.create(name="Shoes", slug="shoes")
+        cls.blue, cls.red, cls.green, cls.runner = (
+            Product.objects.create(name=name, slug=name.lower().replace(" ", "-"), brand=brand,
+                                   price=Decimal(price), category=category)
+            for name, brand, price, category in (
+                ("Blue Cotton Tee", "Acme", 400, tops),
+                ("Red Cotton Tee", "Acme", 420, tops),
+                ("Green Linen Shirt", "Other", 450, tops),
+                ("Trail Runner", "Stride", 8000, shoes),
+            )
+        )
+
+    def test_rebuild_ranks_neighbours(self):
+        similarity.rebuild()
+
+        ranked = [other_id for other_id, _ in similarity.neighbours(self.blue.pk)]
+        self.assertEqual(ranked, [self.red.pk, self.green.pk])
+        scores = [score for _, score in similarity.neighbours(self.blue.pk)]
+        self.assertTrue(0 < scores[1] < scores[0] < 1)
+        # Nothing in common with the tops, and never its own neighbour
+        self.assertEqual(similarity.neighbours(self.runner.pk), [])
+        self.assertFalse(SimilarProduct.objects.filter(product_id=F("other_id")).exists())
+
+    def test_if_changed_skips_an_unchanged_catalog(self):
+        out = StringIO()
+        call_command("rebuild_similar_products", if_changed=True, stdout=out)
+        self.assertIn("rebuilt", out.getvalue())
+        built_at = SimilarProduct.objects.values_list("built_at", flat=True).first()
+
+        out = StringIO()
+        call_command("rebuild_similar_products", if_changed=True, stdout=out)
+        self.assertIn("unchanged", out.getvalue())
+        self.assertEqual(SimilarProduct.objects.values_list("built_at", flat=True).first(), built_at)
+
+        self.runner.price = Decimal(450)
+        self.runner.save()
+        out = StringIO()
+        call_command("rebuild_similar_products", if_changed=True, stdout=out)
+        self.assertIn("rebuilt", out.getvalue())
+        self.assertGreater(SimilarProduct.objects.values_list("built_at", flat=True).first(), built_at)
+
+    def test_shared_features_keep_blocks_sparse(self):
+        Product.objects.all().delete()
+        apparel = Category.objects.create(name="Apparel", slug="apparel")
+        for leaf in ("Tees", "Jeans"):
+            category = Category.objects.create(name=leaf, slug=leaf.lower(), parent=apparel)
+            Product.objects.bulk_create(
+                Product(name=f"{leaf} {i}", slug=f"{leaf.lower()}-{i}", price=Decimal(500), category=category)
+                for i in range(10)
+            )
+
+        # Root category and price band are on every row: no score for them
+        matrix, _ = similarity.feature_matrix()
+        scores = matrix[:4] @ matrix.T
+        self.assertEqual(scores.nnz, 4 * 10)  # each tee against the ten tees only
+        self.assertEqual(matrix.shape[1], 4)  # the two leaves, "tees", "jeans"
+
+
+@override_settings(IMAGE_VARIANT_WIDTHS=(320, 640, 1024), IMAGE_VARIANT_FORMATS=("webp", "jpeg"))
+class ImageVariantTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        # generate_variants closes its (worker thread's) connection when done
+        self.enterContext(mock.patch("products.images.connection"))
+
+    def upload(self, name, size=(800, 400), mode="RGBA", color=(0, 0, 0, 0)):
+        buffer = BytesIO()
+        Image.new(mode, size, color).save(buffer, format="PNG")
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def open(self, name):
+        with default_storage.open(name, "rb") as handle:
+            image = Image.open(handle)
+            image.load()
+        return image
+
+    def test_widths_formats_and_no_upscaling(self):
+        source = self.upload("products/cutout.png")
+        variants = images.build_variants(source)
+
+        self.assertEqual(variants["source"], source)
+        for image_format, extension in (("webp", "WEBP"), ("jpeg", "JPEG")):
+            self.assertEqual(set(variants[image_format]), {"320", "640"})  # never 1024 from 800
+            image = self.open(variants[image_format]["320"])
+            self.assertEqual((image.format, image.size), (extension, (320, 160)))
+
+    def test_transparency(self):
+        variants = images.build_variants(self.upload("products/cutout.png"))
+        # JPEG has no alpha: transparent pixels are flattened onto white, not black
+        self.assertTrue(all(channel > 245 for channel in self.open(variants["jpeg"]["320"]).getpixel((10, 10))))
+        self.assertEqual(self.open(variants["webp"]["320"]).getpixel((10, 10))[3], 0)
+
+        palette = Image.new("P", (800, 400), 0)
+        palette.info["transparency"] = 0
+        buffer = BytesIO()
+        palette.save(buffer, format="PNG", transparency=0)
+        source = default_storage.save("products/palette.png", ContentFile(buffer.getvalue()))
+        jpeg = self.open(images.build_variants(source)["jpeg"]["320"])
+        self.assertTrue(all(channel > 245 for channel in jpeg.getpixel((10, 10))))
+
+    def test_generate_variants_updates_the_row(self):
+        category = Category.objects.create(name="Tops", slug="tops")
+        product = Product.objects.create(
+            name="Tee", slug="tee", price=Decimal(100), category=category,
+            image=self.upload("products/tee.png", mode="RGB", color=(200, 10, 10)),
+        )
+        gallery = ProductImage.objects.create(product=product, image=self.upload("products/gallery/tee.png"))
+        self.assertTrue(images.needs_variants(product))
+        before = Product.objects.get(pk=product.pk).updated_at
+
+        images.generate_variants(Product, product.pk)
+        product.refresh_from_db()
+        self.assertFalse(images.needs_variants(product))
+        self.assertEqual(set(product.image_variants["jpeg"]), {"320", "640"})
+        self.assertGreater(product.updated_at, before)
+
+        # Gallery images bump their product, so cached documents pick them up
+        images.generate_variants(ProductImage, gallery.pk)
+        gallery.refresh_from_db()
+        self.assertFalse(images.needs_variants(gallery))
+        self.assertGreater(Product.objects.get(pk=product.pk).updated_at, product.updated_at)
+
+        # Already built: nothing is regenerated
+        with mock.patch("products.images.build_variants") as build:
+            images.generate_variants(Product, product.pk)
+        build.assert_not_called()
+
+        # A new upload makes the old variants stale
+        product.image = self.upload("products/tee-2.png", mode="RGB")
+        self.assertTrue(images.needs_variants(product))
+
+    def test_srcset_in_serializer(self):
+        category = Category.objects.create(name="Tops", slug="tops")
+        product = Product.objects.create(
+            name="Tee", slug="tee", price=Decimal(100), category=category,
+            image=self.upload("products/tee.png", mode="RGB"),
+        )
+        request = RequestFactory().get("/", HTTP_HOST="shop.example")
+
+        def serialize():
+            return ProductSerializer(
+                Product.objects.get(pk=product.pk), fields=("image_srcset",), context={"request": request}
+            ).data["image_srcset"]
+
+        self.assertEqual(serialize(), {})  # not built yet
+        images.generate_variants(Product, product.pk)
+        srcset = serialize()
+        self.assertEqual(list(srcset), ["webp", "jpeg"])
+        self.assertEqual(
+            srcset["webp"]["320"], "http://shop.example/media/derivatives/products/tee_320w.webp"
+        )
+
+        # Variants of a replaced image are never served
+        Product.objects.filter(pk=product.pk).update(image="products/other.png")
+        self.assertEqual(serialize(), {})
+
+
+class AutocompleteTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.shoes = Category.objects.create(name="Running Shoes", slug="running-shoes")
+        cls.red, cls.road, cls.trail = (
+            Product.objects.create(name=name, slug=slug, brand=brand, price=Decimal(100), category=cls.shoes)
+            for name, slug, brand in (
+                ("Red Running Shoe", "red-running-shoe", "Stride"),
+                ("Road Runner", "road-runner", "Stride"),
+                ("Trail Shoe", "trail-shoe", "Summit"),
+            )
+        )
+
+    def setUp(self):
+        autocomplete_index.build()
+        self.addCleanup(setattr, autocomplete_index, "built_at", None)
+
+    def suggest(self, q, **params):
+        response = self.client.get(reverse("autocomplete"), {"q": q, **params}, HTTP_ACCEPT="application/json")
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, q, kind="products", **params):
+        return [row["name"] for row in self.suggest(q, **params)[kind]]
+
+    def test_prefix_of_any_word(self):
+        with self.assertNumQueries(0):
+            results = self.suggest("run")
+        # Ordered by the matching term: "road runner" < "running shoe" (x2)
+        self.assertEqual([row["name"] for row in results["products"]], ["Road Runner", "Red Running Shoe"])
+        self.assertEqual(results["categories"], [{"id": self.shoes.pk, "name": "Running Shoes", "slug": "running-shoes"}])
+        self.assertEqual(self.names("sho"), ["Red Running Shoe", "Trail Shoe"])
+        self.assertEqual(self.names("  RED  run"), ["Red Running Shoe"])
+        self.assertEqual(self.names("x"), [])
+
+    def test_limit_is_clamped(self):
+        self.assertEqual(len(self.names("r", limit=1)), 1)
+        self.assertEqual(len(self.names("r", limit=0)), 1)
+        self.assertEqual(len(self.names("r", limit=-3)), 1)
+        self.assertEqual(len(self.names("r", limit="abc")), 2)  # the default 5 covers both
+
+    def test_brand_refcounting(self):
+        self.assertEqual(self.names("str", "brands"), ["Stride"])
+
+        self.red.brand = "Summit"
+        self.red.save()
+        self.assertEqual(self.names("str", "brands"), ["Stride"])  # still on Road Runner
+
+        self.red.name = "Crimson Shoe"
+        self.red.save()
+        self.assertEqual(self.names("red"), [])
+        self.assertEqual(self.names("crim"), ["Crimson Shoe"])
+
+        self.road.delete()
+        self.assertEqual(self.names("str", "brands"), [])
+        self.assertEqual(self.names("road"), [])
+
+        self.trail.delete()
+        self.assertEqual(self.names("sum", "brands"), ["Summit"])  # Crimson Shoe keeps it
+
+    def test_category_rename_and_delete(self):
+        self.shoes.name = "Sneakers"
+        self.shoes.save()
+        self.assertEqual(self.names("runn", "categories"), [])
+        self.assertEqual(self.names("snea", "categories"), ["Sneakers"])
+
+        Category.objects.create(name="Sandals", slug="sandals").delete()
+        self.assertEqual(self.names("san", "categories"), [])
+
+    @override_settings(AUTOCOMPLETE_REFRESH_SECONDS=60)
+    def test_stale_index_rebuilds_in_the_background(self):
+        autocomplete_index.built_at -= 120
+        # Not seen by this process's receivers
+        Product.objects.filter(pk=self.trail.pk).update(name="Trail Boot")
+
+        with mock.patch("products.autocomplete.threading.Thread") as thread:
+            self.assertEqual(self.names("trail"), ["Trail Shoe"])  # old index, no waiting
+            self.assertEqual(self.names("trail"), ["Trail Shoe"])
+        thread.assert_called_once()  # one rebuild, however many stale requests
+
+        with mock.patch("products.autocomplete.connection"):
+            thread.call_args.kwargs["target"]()
+        self.assertEqual(self.names("trail"), ["Trail Boot"])
+
+
+class CooccurrenceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tops", slug="tops")
+        cls.a, cls.b, cls.c, cls.d = Product.objects.bulk_create(
+            Product(name=name, slug=name.lower(), price=Decimal(100), category=category)
+            for name in ("Tee", "Cap", "Sock", "Belt")
+        )
+        cls.user = User.objects.create(email="shopper@example.com", phone="9000000001")
+        for lines in (
+            [(cls.a, "M"), (cls.b, ""), (cls.c, "")],
+            [(cls.a, "L"), (cls.b, "")],
+            [(cls.a, "M"), (cls.a, "L"), (cls.d, "")],  # two lines, one product
+        ):
+            cls.order(lines)
+
+    @classmethod
+    def order(cls, lines):
+        order = Order.objects.create(user=cls.user, order_id=str(uuid.uuid4()), total_amount=Decimal(100))
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, size=size, quantity=1, price=Decimal(100))
+            for product, size in lines
+        )
+        return order
+
+    def pairs(self):
+        return dict(
+            ((product_id, other_id), count)
+            for product_id, other_id, count in ProductCooccurrence.objects.values_list("product_id", "other_id", "count")
+        )
+
+    @skipUnless(cooccurrence.np, "numpy / scipy are not installed")
+    def test_matrix_counts_orders_not_lines(self):
+        matrix, products = cooccurrence.cooccurrence_matrix(*cooccurrence.order_pairs())
+        index = {product_id: position for position, product_id in enumerate(products.tolist())}
+
+        def count(x, y):
+            return matrix[index[x.pk], index[y.pk]]
+
+        self.assertEqual((count(self.a, self.b), count(self.b, self.a)), (2, 2))
+        self.assertEqual((count(self.a, self.c), count(self.b, self.c), count(self.a, self.d)), (1, 1, 1))
+        self.assertEqual((count(self.c, self.d), count(self.b, self.d)), (0, 0))
+        self.assertEqual(matrix.diagonal().tolist(), [0, 0, 0, 0])  # never its own neighbour
+        self.assertEqual(matrix.nnz, 8)
+
+    @skipUnless(cooccurrence.np, "numpy / scipy are not installed")
+    @override_settings(COOCCURRENCE_TOP_K=2)
+    def test_rebuild_keeps_top_k(self):
+        self.assertEqual(cooccurrence.rebuild(), 2 + 2 + 2 + 1)
+        self.assertEqual(cooccurrence.neighbours(self.a.pk), [(self.b.pk, 2), (self.c.pk, 1)])
+        self.assertEqual(cooccurrence.neighbours(self.c.pk), [(self.a.pk, 1), (self.b.pk, 1)])
+        self.assertEqual(cooccurrence.neighbours(self.d.pk), [(self.a.pk, 1)])
+        self.assertEqual(cooccurrence.neighbours(self.a.pk, limit=1), [(self.b.pk, 2)])
+
+    def test_record_order_bumps_pairs(self):
+        ProductCooccurrence.objects.create(product=self.a, other=self.b, count=5)
+        cooccurrence.record_order(self.order([(self.a, ""), (self.b, ""), (self.b, "M"), (self.d, "")]))
+        self.assertEqual(self.pairs(), {
+            (self.a.pk, self.b.pk): 6, (self.b.pk, self.a.pk): 1,
+            (self.a.pk, self.d.pk): 1, (self.d.pk, self.a.pk): 1,
+            (self.b.pk, self.d.pk): 1, (self.d.pk, self.b.pk): 1,
+        })
+
+        cooccurrence.record_order(self.order([(self.c, "")]))  # nothing to pair
+        self.assertEqual(len(self.pairs()), 6)
+
+    @mock.patch("products.views.razorpay.Client")
+    def test_verified_payment_feeds_bought_together(self, client):
+        cart = Cart.objects.create(user=self.user, cart_code="paying")
+        CartItem.objects.bulk_create(CartItem(cart=cart, product=product) for product in (self.c, self.d))
+        Payment.objects.create(user=self.user, cart=cart, razorpay_order_id="order_1", amount=Decimal(200))
+        address = UserAddress.objects.create(
+            user=self.user, full_address="1 Main St", city="Pune", state="MH", pincode="411001",
+        )
+
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("verify-payment"),
+            {"razorpay_order_id": "order_1", "razorpay_payment_id": "pay_1", "razorpay_signature": "sig",
+             "address_id": address.pk},
+            content_type="application/json",
+            HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(
+            reverse("bought-together", args=[self.c.pk]), {"fields": "id"}, HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.json(), [{"id": self.d.pk}])
+
+
+class RecordOrderConcurrencyTests(TransactionTestCase):
+    """Orders verified at the same time must each count for a pair."""
+
+    THREADS = 8
+
+    def setUp(self):
+        category = Category.objects.create(name="Root", slug="root")
+        self.products = Product.objects.bulk_create(
+            Product(name=name, slug=name.lower(), price=Decimal(100), category=category) for name in ("Tee", "Cap")
+        )
+        user = User.objects.create(email="shopper@example.com", phone="9000000001")
+        self.orders = []
+        for i in range(self.THREADS):
+            order = Order.objects.create(user=user, order_id=f"o-{i}", total_amount=Decimal(200))
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=1, price=Decimal(100)) for product in self.products
+            )
+            self.orders.append(order)
+
+    def record(self, order):
+        try:
+            while True:
+                try:
+                    cooccurrence.record_order(order)
+                    break
+                except OperationalError:  # SQLite "table is locked": the write didn't happen
+                    continue
+        finally:
+            connection.close()
+
+    def test_no_lost_increments(self):
+        with ThreadPoolExecutor(max_workers=self.THREADS) as pool:
+            list(pool.map(self.record, self.orders))
+        self.assertEqual(list(ProductCooccurrence.objects.values_list("count", flat=True)), [self.THREADS] * 2)
+
+
+class ProductBatchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tops", slug="tops")
+        cls.ids = [
+            product.pk for product in Product.objects.bulk_create(
+                Product(name=f"Tee {i}", slug=f"tee-{i}", price=Decimal(100), category=category) for i in range(3)
+            )
+        ]
+
+    def get(self, ids, **params):
+        return self.client.get(reverse("product-batch"), {"ids": ids, **params}, HTTP_ACCEPT="application/json")
+
+    def test_keeps_requested_order_and_lists_missing(self):
+        first, second, third = self.ids
+        response = self.get(f"{third},999999,{first},{second}", fields="id")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {"results": [{"id": third}, {"id": first}, {"id": second}], "missing": [999999]},
+        )
+
+    def test_duplicates_are_returned_once(self):
+        first, second, _ = self.ids
+        response = self.client.post(
+            reverse("product-batch") + "?fields=id", {"ids": [second, first, second, str(first)]},
+            content_type="application/json", HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.json(), {"results": [{"id": second}, {"id": first}], "missing": []})
+
+    @override_settings(PRODUCT_BATCH_MAX_IDS=3)
+    def test_max_ids(self):
+        self.assertEqual(self.get("1,2,3,3,2").status_code, 200)  # three distinct
+        self.assertEqual(self.get("1,2,3,4").status_code, 400)
+
+    def test_rejects_bad_ids(self):
+        for ids in ("abc", "1,x", "0", "-4", str(2 ** 63), "99999999999999999999999"):
+            self.assertEqual(self.get(ids).status_code, 400, ids)
+        response = self.client.post(
+            reverse("product-batch"), [1, 2], content_type="application/json", HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.get(str(2 ** 63 - 1)).json()["missing"], [2 ** 63 - 1])
+
+
+@skipUnless(msgpack, "msgpack is not installed")
+class MessagePackTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name="Tops", slug="tops")
+        cls.products = Product.objects.bulk_create(
+            Product(
+                name=f"Linen shirt {i}", slug=f"linen-shirt-{i}", price=Decimal("499.50") + i,
+                original_price=Decimal(600), brand="Loom", rating=4.5, category=category,
+            )
+            for i in range(3)
+        )
+        search.rebuild()
+
+    def get(self, url, params=None, accept="application/json", **headers):
+        return self.client.get(url, params or {}, HTTP_ACCEPT=accept, **headers)
+
+    def post(self, name, data, method="post"):
+        return getattr(self.client, method)(
+            reverse(name), msgpack.packb(data), content_type="application/msgpack", HTTP_ACCEPT="application/json",
+        )
+
+    def test_same_payload_as_json(self):
+        for url, params in (
+            (reverse("products-by-category", args=["tops"]), {"page_size": 2}),
+            (reverse("search-products"), {"q": "linen", "facets": "brand,price"}),
+        ):
+            with self.subTest(url=url):
+                as_json = self.get(url, params)
+                as_msgpack = self.get(url, params, accept="application/msgpack")
+                self.assertEqual(as_msgpack.status_code, 200)
+                self.assertEqual(as_msgpack["Content-Type"], "application/msgpack")
+                self.assertEqual(msgpack.unpackb(as_msgpack.content), as_json.json())
+
+        as_msgpack = self.get(reverse("search-products"), {"q": "linen", "format": "msgpack"}, accept="*/*")
+        self.assertEqual(as_msgpack["Content-Type"], "application/msgpack")
+
+    def test_request_bodies(self):
+        response = self.post("add-to-cart", {"cart_code": "packed", "product_id": self.products[0].pk, "quantity": 2})
+        self.assertEqual(response.status_code, 201)
+        item = CartItem.objects.get(cart__cart_code="packed")
+        self.assertEqual(item.quantity, 2)
+
+        response = self.post("update-quantity", {"item_id": item.pk, "quantity": 5}, method="patch")
+        self.assertEqual(response.status_code, 200)
+        item.refresh_from_db()
+        self.assertEqual(item.quantity, 5)
+
+    def test_malformed_body_is_400(self):
+        response = self.client.post(
+            reverse("cart-batch"), b"\xc1\x00", content_type="application/msgpack", HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("MessagePack parse error", response.json()["detail"])
+
+    def test_etag_per_format(self):
+        url = reverse("products-by-category", args=["tops"])
+        json_etag = self.get(url)["ETag"]
+        msgpack_etag = self.get(url, accept="application/msgpack")["ETag"]
+        self.assertNotEqual(json_etag, msgpack_etag)
+
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=json_etag).status_code, 304)
+        self.assertEqual(self.get(url, accept="application/msgpack", HTTP_IF_NONE_MATCH=msgpack_etag).status_code, 304)
+        self.assertEqual(self.get(url, accept="application/msgpack", HTTP_IF_NONE_MATCH=json_etag).status_code, 200)
+        self.assertEqual(self.get(url, HTTP_IF_NONE_MATCH=msgpack_etag).status_code, 200)
+        self.assertIn("Accept", self.get(url)["Vary"])
+
+
+class QueryCountTests(TestCase):
+    """Serializing a cart / wishlist / order history / listing costs the same queries for 1 row or many."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Tops", slug="tops")
+        cls.user = User.objects.create(email="shopper@example.com", phone="9000000001")
+        cls.cart = Cart.objects.create(user=cls.user, cart_code="counted")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.rows = 0
+
+    def add_rows(self, count):
+        """`count` more products, each in the cart, the wishlist and an order, with images and stock."""
+        order = Order.objects.create(user=self.user, order_id=str(uuid.uuid4()), total_amount=Decimal(100))
+        for _ in range(count):
+            self.rows += 1
+            product = Product.objects.create(
+                name=f"Tee {self.rows}", slug=f"tee-{self.rows}", price=Decimal(100), category=self.category,
+            )
+            ProductImage.objects.create(product=product, image=f"products/gallery/tee-{self.rows}.jpg")
+            ProductStock.objects.bulk_create(ProductStock(product=product, size=size) for size in ("S", "M"))
+            CartItem.objects.create(cart=self.cart, product=product)
+            Wishlist.objects.create(user=self.user, product=product)
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=Decimal(100))
+
+    def assertConstantQueries(self, queries, url, params=None):
+        for count in (1, 5):
+            self.add_rows(count)
+            cache.clear()  # listing documents are cached; count the cold path
+            with self.assertNumQueries(queries):
+                response = self.client.get(url, params or {}, HTTP_ACCEPT="application/json")
+            self.assertEqual(response.status_code, 200)
+
+    # Each count starts with the session and user lookups (2)
+
+    def test_get_cart(self):
+        # cart, items, products, images, stock
+        self.assertConstantQueries(7, reverse("get-cart"))
+
+    def test_get_wishlist(self):
+        # wishlist rows, products, images, stock
+        self.assertConstantQueries(6, reverse("get-wishlist"))
+
+    def test_get_user_orders(self):
+        # orders (+ address), items, products, images, stock
+        self.assertConstantQueries(7, "/api/orders/")
+
+    def test_product_listing(self):
+        # category + validator aggregate (ETag), category, products, images, stock
+        self.assertConstantQueries(8, reverse("products-by-category", args=["tops"]))
+
+
+class DiscountPercentTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Tops", slug="tops")
+
+    def product(self, original_price, price):
+        product = Product.objects.create(
+            name="Tee", slug=f"tee-{uuid.uuid4().hex}", category=self.category,
+            price=Decimal(price), original_price=None if original_price is None else Decimal(original_price),
+        )
+        return Product.objects.get(pk=product.pk)  # the database computes the column
+
+    def test_halves_round_to_even(self):
+        for original_price, price, expected in (
+            ("800", "700", 12),     # 12.5
+            ("800", "660", 18),     # 17.5
+            ("200", "199", 0),      # 0.5
+            ("200", "197", 2),      # 1.5
+            ("300", "200", 33),
+            ("300", "100", 67),
+            ("999.99", "499.99", 50),
+        ):
+            with self.subTest(original_price=original_price, price=price):
+                self.assertEqual(self.product(original_price, price).discount_percent, expected)
+
+    def test_matches_python_round(self):
+        # What the serializer computed before the column existed
+        for original_price in (Decimal("7.99"), Decimal(8), Decimal(40), Decimal("99.99"), Decimal("1234.56")):
+            for step in range(1, 40, 3):
+                price = (original_price * step / 40).quantize(Decimal("0.01"))
+                expected = round((original_price - price) / original_price * 100)
+                self.assertEqual(self.product(original_price, price).discount_percent, expected, (original_price, price))
+
+    def test_no_discount(self):
+        self.assertEqual(self.product("100", "100").discount_percent, 0)
+        self.assertEqual(self.product("100", "150").discount_percent, 0)
+        self.assertEqual(self.product(None, "100").discount_percent, 0)
+        self.assertEqual(self.product("100", "0").discount_percent, 100)
+
+    def test_min_discount_filter(self):
+        twelve, eighteen, full_price = self.product("800", "700"), self.product("800", "660"), self.product(None, "50")
+
+        def listed(min_discount):
+            response = self.client.get(
+                reverse("products-by-category", args=["tops"]),
+                {"min_discount": min_discount, "fields": "id"}, HTTP_ACCEPT="application/json",
+            )
+            return [product["id"] for product in response.json()]
+
+        self.assertEqual(listed("13"), [eighteen.pk])
+        self.assertEqual(listed("12"), [twelve.pk, eighteen.pk])
+        self.assertEqual(listed("x"), [twelve.pk, eighteen.pk, full_price.pk])  # unparseable: not filtered
+
+
+class FacetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        apparel = Category.objects.create(name="Apparel", slug="apparel")
+        cls.tops = Category.objects.create(name="Tops", slug="tops", parent=apparel)
+        cls.shoes = Category.objects.create(name="Shoes", slug="shoes", parent=apparel)
+        products = Product.objects.bulk_create(
+            Product(name=name, slug=name.lower().replace(" ", "-"), brand=brand, price=Decimal(price), category=category)
+            for name, brand, price, category in (
+                ("Linen Tee", "Loom", "499.99", cls.tops),
+                ("Oxford Shirt", "Loom", "500", cls.tops),
+                ("Polo", "Weaver", "999.99", cls.tops),
+                ("Kurta", "", "1000", cls.tops),
+                ("Trail Runner", "Stride", "4999.99", cls.shoes),
+                ("Road Runner", "Stride", "5000", cls.shoes),
+            )
+        )
+        tee, shirt, polo, _, trail, road = products
+        ProductStock.objects.bulk_create(
+            ProductStock(product=product, size=size, quantity=quantity)
+            for product, size, quantity in (
+                (tee, "M", 3), (tee, "L", 0), (shirt, "M", 1), (shirt, "S", 2), (polo, "L", 0),
+                (trail, "9", 1), (road, "9", 4),
+            )
+        )
+
+    def facets(self, path="apparel", **params):
+        response = self.client.get(
+            reverse("products-by-category", args=[path]), {"facets": "all", **params}, HTTP_ACCEPT="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_counts(self):
+        facets = self.facets()["facets"]
+        self.assertEqual(facets["category"], [
+            {"id": self.tops.pk, "name": "Tops", "slug": "tops", "count": 4},
+            {"id": self.shoes.pk, "name": "Shoes", "slug": "shoes", "count": 2},
+        ])
+        # Blank brands are left out
+        self.assertEqual(facets["brand"], [
+            {"brand": "Loom", "count": 2}, {"brand": "Stride", "count": 2}, {"brand": "Weaver", "count": 1},
+        ])
+        # In-stock sizes only, counted per product
+        self.assertEqual(facets["size"], [{"size": "9", "count": 2}, {"size": "M", "count": 2}, {"size": "S", "count": 1}])
+
+    def test_price_buckets_include_their_lower_edge(self):
+        self.assertEqual(self.facets()["facets"]["price"], [
+            {"min": 0, "max": 500, "count": 1},         # 499.99
+            {"min": 500, "max": 1000, "count": 2},      # 500, 999.99
+            {"min": 1000, "max": 2000, "count": 1},     # 1000
+            {"min": 2000, "max": 5000, "count": 1},     # 4999.99
+            {"min": 5000, "max": None, "count": 1},     # 5000
+        ])
+
+    @override_settings(PRODUCT_PRICE_BUCKETS=(1000,))
+    def test_price_buckets_setting(self):
+        self.assertEqual(self.facets()["facets"]["price"], [
+            {"min": 0, "max": 1000, "count": 3}, {"min": 1000, "max": None, "count": 3},
+        ])
+
+    def test_counts_ignore_the_page_window(self):
+        unpaginated = self.facets()
+        self.assertEqual(len(unpaginated["results"]), 6)
+
+        paginated = self.facets(page_size=2)
+        self.assertEqual(len(paginated["results"]), 2)
+        self.assertIsNotNone(paginated["next"])
+        self.assertEqual(paginated["facets"], unpaginated["facets"])
+
+        # ...and the next page carries the same counts
+        following = self.client.get(paginated["next"], HTTP_ACCEPT="application/json").json()
+        self.assertEqual(following["facets"], unpaginated["facets"])
+
+    def test_selected_facets_only(self):
+        self.assertEqual(set(self.facets(facets="brand,size,bogus")["facets"]), {"brand", "size"})
+        self.assertEqual(
+            self.facets("apparel/shoes")["facets"]["category"],
+            [{"id": self.shoes.pk, "name": "Shoes", "slug": "shoes", "count": 2}],
+        )
+        response = self.client.get(reverse("products-by-category", args=["apparel"]), HTTP_ACCEPT="application/json")
+        self.assertIsInstance(response.json(), list)  # no ?facets=: plain list as before
@@ -0,0 +1,144 @@
+"""
+Data-driven trending ranking.
+
+A product's score is a time-decayed sum of recent activity:
+
+    score = Σ weight(source) · ½ ^ (age / TRENDING_HALF_LIFE_HOURS)
+
+``update_scores()`` (``manage.py update_trending_scores``, run on a
+schedule) moves the stored scores forward in two set-based steps
+instead of rescanning order history:
+
+1. every stored score is multiplied by ½ ^ (elapsed / half-life) since
+   the previous run (one UPDATE), and those below TRENDING_MIN_SCORE
+   are dropped;
+2. OrderItem / Wishlist / CartItem rows created since the previous run
+   (primary-key high-water marks in TrendingCursor) are grouped per
+   product and hour, decayed by their age and upserted in batches.
+
+The mark only moves up to the newest row older than
+TRENDING_GRACE_SECONDS. Sequence ids are handed out at INSERT but rows
+become visible at COMMIT, so a slow transaction can commit a lower id
+after a higher one was already counted; lagging the mark keeps such
+rows ahead of the cursor instead of skipping them for good.
+
+trending_products then reads the top TRENDING_LIMIT rows straight off
+the TrendingScore index; products an admin flagged ``is_trending`` are
+always included and listed first.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncHour
+from django.utils import timezone
+
+from .models import CartItem, OrderItem, Product, TrendingCursor, TrendingScore, Wishlist
+
+
+# source → (model, event timestamp, quantity field or None to count rows)
+SOURCES = {
+    "order_item": (OrderItem, "order__created_at", "quantity"),
+    "wishlist": (Wishlist, "added_at", None),
+    "cart_item": (CartItem, "added_at", None),
+}
+
+DEFAULT_WEIGHTS = {"order_item": 3.0, "wishlist": 2.0, "cart_item": 1.0}
+
+# Flagged products first, then by score (id keeps keyset pagination stable)
+TRENDING_ORDERING = ("-is_trending", "-trend_score", "id")
+
+
+def half_life_seconds():
+    return getattr(settings, "TRENDING_HALF_LIFE_HOURS", 72) * 3600
+
+
+def decay(seconds):
+    return 0.5 ** (max(seconds, 0) / half_life_seconds())
+
+
+def new_activity(now):
+    """{product_id: decayed weight} for events since each source's cursor."""
+    weights = {**DEFAULT_WEIGHTS, **getattr(settings, "TRENDING_WEIGHTS", {})}
+    settled = now - timedelta(seconds=getattr(settings, "TRENDING_GRACE_SECONDS", 300))
+    gains = defaultdict(float)
+
+    for source, (model, timestamp, quantity) in SOURCES.items():
+        cursor, _ = TrendingCursor.objects.select_for_update().get_or_create(source=source)
+        high = (
+            model.objects.filter(id__gt=cursor.last_id, **{f"{timestamp}__lt": settled})
+            .aggregate(high=Max("id"))["high"]
+        )
+        if high is None:
+            continue
+
+        rows = (
+            model.objects.filter(id__gt=cursor.last_id, id__lte=high)
+            .annotate(hour=TruncHour(timestamp))
+            .values("product_id", "hour")
+            .annotate(events=Sum(quantity) if quantity else Count("id"))
+        )
+        for row in rows:
+            age = (now - row["hour"]).total_seconds() if row["hour"] else 0
+            gains[row["product_id"]] += weights[source] * row["events"] * decay(age)
+
+        cursor.last_id = high
+        cursor.updated_at = now
+        cursor.save(update_fields=["last_id", "updated_at"])
+
+    return gains
+
+
+@transaction.atomic
+def update_scores(now=None, batch_size=1000):
+    """Decay stored scores to `now` and fold in new activity. Returns products touched."""
+    now = now or timezone.now()
+    min_score = getattr(settings, "TRENDING_MIN_SCORE", 0.01)
+
+    clock, created = TrendingCursor.objects.select_for_update().get_or_create(
+        source="decay", defaults={"updated_at": now}
+    )
+    if not created:
+        factor = decay((now - clock.updated_at).total_seconds())
+        if factor < 1:
+            TrendingScore.objects.update(score=F("score") * factor, updated_at=now)
+            TrendingScore.objects.filter(score__lt=min_score).delete()
+        clock.updated_at = now
+        clock.save(update_fields=["updated_at"])
+
+    gains = new_activity(now)
+    product_ids = [pk for pk, gain in gains.items() if gain >= min_score]
+    for start in range(0, len(product_ids), batch_size):
+        chunk = product_ids[start:start + batch_size]
+        current = dict(
+            TrendingScore.objects.filter(product_id__in=chunk).values_list("product_id", "score")
+        )
+        TrendingScore.objects.bulk_create(
+            [
+                TrendingScore(product_id=pk, score=current.get(pk, 0) + gains[pk], updated_at=now)
+                for pk in chunk
+            ],
+            update_conflicts=True,
+            unique_fields=["product"],
+            update_fields=["score", "updated_at"],
+        )
+    return len(product_ids)
+
+
+def trending_queryset(limit=None):
+    """
+    Flagged products plus the top `limit` by score (unordered; sort by
+    TRENDING_ORDERING).
+    """
+    limit = limit or getattr(settings, "TRENDING_LIMIT", 50)
+    top = TrendingScore.objects.order_by("-score", "product").values("product_id")[:limit]
+    # Two id lists (flag index / score index) rather than a bare
+    # is_trending OR, so the planner never falls back to a table scan
+    flagged = Product.objects.filter(is_trending=True).values("pk")
+    return (
+        Product.objects.filter(Q(pk__in=flagged) | Q(pk__in=top))
+        .annotate(trend_score=Coalesce(F("trending_score__score"), Value(0.0)))
+    )
+
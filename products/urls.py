@@ -7,7 +7,11 @@ from .views import (
     category_list,
     products_by_category,
     product_detail,
+    product_batch,
+    bought_together,
+    similar_products,
     search_products,
+    autocomplete,
 
     # 🛒 Cart System
     get_cart,
@@ -16,6 +20,8 @@ from .views import (
     delete_cartitem,
     product_in_cart,
     get_cart_stat,
+    cart_batch,
+    cart_summary,
 
     # ❤️ Wishlist
     get_wishlist,
@@ -39,17 +45,23 @@ urlpatterns = [
     # =====================================================
     re_path(r"^categories(?:/(?P<path>.+))?/$", category_list, name="category-list"),
     re_path(r"^products/(?P<path>.+)/$", products_by_category, name="products-by-category"),
+    path("product/<int:id>/bought-together/", bought_together, name="bought-together"),
+    path("product/<int:id>/similar/", similar_products, name="similar-products"),
     path("product/<int:id>/<slug:slug>/", product_detail, name="product-detail"),
+    path("product/batch/", product_batch, name="product-batch"),
     path("search/", search_products, name="search-products"),
+    path("autocomplete/", autocomplete, name="autocomplete"),
 
     # =====================================================
     # 🛒 CART ROUTES
     # =====================================================
     path("cart/", get_cart, name="get-cart"),
     path("cart/add/", add_item, name="add-to-cart"),
+    path("cart/batch/", cart_batch, name="cart-batch"),
     path("cart/update/", update_quantity, name="update-quantity"),
     path("cart/delete/", delete_cartitem, name="delete-cartitem"),
     path("cart/status/", get_cart_stat, name="get-cart-stat"),
+    path("cart/summary/", cart_summary, name="cart-summary"),
     path("cart/check/", product_in_cart, name="product-in-cart"),
 
     # =====================================================
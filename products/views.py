@@ -1,10 +1,12 @@
 from django.shortcuts import render, get_object_or_404
-from django.db.models import Q
+from django.http import Http404
+from django.db.models import Q, prefetch_related_objects
 from django.utils.crypto import get_random_string
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
+import logging
 import razorpay
 from django.conf import settings
 from rest_framework.decorators import api_view, permission_classes
@@ -19,7 +21,7 @@ from accounts.models import ServiceArea
 
 
 from .models import (
-    Category, Product, Wishlist
+    MAX_PK, Category, Product, Wishlist, product_prefetch, subtree_lookup
 )
 from .serializers import (
     CategorySerializer, ProductSerializer,
@@ -27,81 +29,117 @@ from .serializers import (
     WishlistSerializer
 )
 from .models import Cart, CartItem
+from .pagination import KeysetPagination
+from .facets import requested_facets, compute_facets
+from .documents import product_documents, requested_fields
+from .conditional import conditional, queryset_validators
+from . import search
+from . import trending
+from . import cooccurrence
+from . import similarity
+from . import carts
+from .autocomplete import index as autocomplete_index
+
+logger = logging.getLogger(__name__)
 
-def merge_guest_cart(user, cart_code):
+# ============================================================
+# 🏷 CATEGORY & PRODUCT APIs
+# ============================================================
+
+# ?ordering= → sort keys (the last one unique, for keyset pagination)
+LISTING_ORDERINGS = {
+    "price": ("price", "id"),
+    "-price": ("-price", "-id"),
+    "discount": ("-discount_percent", "id"),   # biggest discount first
+    "rating": ("-rating", "id"),                # best rated first
+    "newest": ("-id",),
+}
+
+
+def apply_listing_params(request, queryset, ordering):
+    """?min_discount= and ?ordering= filtering / sorting, all in SQL."""
     try:
-        guest_cart = Cart.objects.filter(cart_code=cart_code, paid=False).first()
-        if not guest_cart:
-            return
-        
-        user_cart, _ = Cart.objects.get_or_create(user=user, paid=False)
-
-        for item in guest_cart.items.all():
-            # Merge item
-            existing, created = CartItem.objects.get_or_create(
-                cart=user_cart,
-                product=item.product,
-                size=item.size,
-                defaults={"quantity": item.quantity}
-            )
-            if not created:
-                existing.quantity += item.quantity
-                existing.save()
+        min_discount = int(request.query_params.get("min_discount", ""))
+    except ValueError:
+        pass
+    else:
+        queryset = queryset.filter(discount_percent__gte=min_discount)
 
-        guest_cart.delete()
+    requested = LISTING_ORDERINGS.get(request.query_params.get("ordering"))
+    if requested:
+        ordering = requested
+        queryset = queryset.order_by(*ordering)
+    return queryset, ordering
 
-    except Exception as e:
-        print("Cart merge error:", e)
 
-# ============================================================
-# 🏷 CATEGORY & PRODUCT APIs
-# ============================================================
+def product_list_response(request, queryset, ordering=("id",), with_facets=False):
+    """
+    Serialize a product listing from cached product documents. With ?cursor= or ?page_size= the result
+    is keyset-paginated ({"next", "results"}); otherwise the full list is
+    returned as before.
+
+    When `with_facets` is set and the client sends ?facets=..., grouped
+    counts over the whole result set are added under "facets" (a plain
+    list response becomes {"results", "facets"}).
+
+    ?fields=card (or a comma list of field names) trims every product to
+    those fields; see documents.requested_fields. ?ordering= and
+    ?min_discount= are applied first; see LISTING_ORDERINGS.
+    """
+    queryset, ordering = apply_listing_params(request, queryset, ordering)
+    fields = requested_fields(request)
+    facet_names = requested_facets(request) if with_facets else ()
+    facets = compute_facets(queryset, facet_names) if facet_names else None
+
+    if not KeysetPagination.is_requested(request):
+        documents = product_documents(queryset, request, fields)
+        if facets is None:
+            return Response(documents)
+        return Response({"results": documents, "facets": facets})
+
+    paginator = KeysetPagination(ordering)
+    page = paginator.paginate_queryset(queryset, request)
+    response = paginator.get_paginated_response(product_documents(page, request, fields))
+    if facets is not None:
+        response.data["facets"] = facets
+    return response
+
+
+def child_categories(path=None):
+    if not path:
+        return Category.objects.filter(parent=None)
+    category = get_object_or_404(Category, slug_path=path.strip("/"))
+    return category.children.all()
+
+
+def category_products(path):
+    category = get_object_or_404(Category, slug_path=path.strip("/"))
+
+    # 🌳 Whole subtree in one query (materialized id_path prefix)
+    return Product.objects.filter(**subtree_lookup(category.id_path, through="category__"))
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@conditional(lambda request, path=None: queryset_validators(child_categories(path)))
 def category_list(request, path=None):
-    categories = Category.objects.none()
-    if not path:
-        categories = Category.objects.filter(parent=None)
-    else:
-        slugs = path.strip("/").split("/")
-        parent = None
-        category = None
-        for slug in slugs:
-            category = get_object_or_404(Category, slug=slug, parent=parent)
-            parent = category
-        if category:
-            categories = category.children.all()
-
+    categories = child_categories(path)
     serializer = CategorySerializer(categories, many=True, context={'request': request})
     return Response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@conditional(lambda request, path: queryset_validators(
+    category_products(path), "updated_at", "category__updated_at"
+))
 def products_by_category(request, path):
-    slugs = path.strip("/").split("/")
-    parent = None
-    category = None
-    for slug in slugs:
-        category = get_object_or_404(Category, slug=slug, parent=parent)
-        parent = category
-
-    def get_all_subs(cat):
-        subs = cat.children.all()
-        result = list(subs)
-        for sub in subs:
-            result += get_all_subs(sub)
-        return result
-
-    subcats = get_all_subs(category)
-    categories_to_search = [category] + subcats
-    products = Product.objects.filter(category__in=categories_to_search).distinct()
-    serializer = ProductSerializer(products, many=True, context={'request': request})
-    return Response(serializer.data)
+    products = category_products(path)
+    return product_list_response(request, products, with_facets=True)
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@conditional(lambda request, id, slug: queryset_validators(Product.objects.filter(id=id)))
 def product_detail(request, id, slug):
     product = get_object_or_404(Product, id=id)
 
@@ -112,25 +150,93 @@ def product_detail(request, id, slug):
             status=301
         )
 
-    serializer = ProductSerializer(product, context={'request': request})
-    return Response(serializer.data)
+    return Response(product_documents([product], request, requested_fields(request))[0])
+
+
+
+@api_view(['GET', 'POST'])
+@permission_classes([AllowAny])
+def product_batch(request):
+    """
+    Several products in one round trip: GET ?ids=3,1,2 or POST {"ids": [...]}.
+    Results keep the requested order; ids that don't exist are listed
+    under "missing".
+    """
+    if request.method == "POST":
+        raw = request.data.get("ids") if isinstance(request.data, dict) else None
+    else:
+        raw = request.query_params.get("ids", "")
+    if isinstance(raw, str):
+        raw = [part for part in raw.split(",") if part.strip()]
+    if not isinstance(raw, list):
+        return Response({"error": "ids must be a list of product ids"}, status=400)
+
+    try:
+        ids = list(dict.fromkeys(int(pk) for pk in raw))
+    except (TypeError, ValueError):
+        return Response({"error": "ids must be a list of product ids"}, status=400)
+    if any(not 1 <= pk <= MAX_PK for pk in ids):
+        return Response({"error": "ids must be a list of product ids"}, status=400)
+
+    max_ids = getattr(settings, "PRODUCT_BATCH_MAX_IDS", 250)
+    if len(ids) > max_ids:
+        return Response({"error": f"At most {max_ids} ids per request"}, status=400)
+
+    found = Product.objects.in_bulk(ids)
+    products = [found[pk] for pk in ids if pk in found]
+    return Response({
+        "results": product_documents(products, request, requested_fields(request)),
+        "missing": [pk for pk in ids if pk not in found],
+    })
+
+
+def neighbour_response(request, lookup, product_id):
+    """Render `lookup(product_id, limit)` → [(other_id, weight), ...] as product documents."""
+    try:
+        limit = int(request.query_params.get("limit", 0)) or None
+    except ValueError:
+        limit = None
+
+    pairs = lookup(product_id, limit)
+    found = Product.objects.in_bulk([other_id for other_id, _ in pairs])
+    products = [found[other_id] for other_id, _ in pairs if other_id in found]
+    return Response(product_documents(products, request, requested_fields(request)))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def bought_together(request, id):
+    """Products most often ordered together with product `id` (?limit=, ?fields=)."""
+    return neighbour_response(request, cooccurrence.neighbours, id)
 
 
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def similar_products(request, id):
+    """Products closest to product `id` by category, brand, price and name (?limit=, ?fields=)."""
+    return neighbour_response(request, similarity.neighbours, id)
+
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def search_products(request):
     queryset = Product.objects.all()
+    ordering = ("id",)
 
     # 🔍 Main search (name + desc + brand + category)
     query = request.GET.get('q') or request.GET.get('search')
-    if query:
+    searched = search.search_queryset(queryset, query) if query else None
+    if searched is not None:
+        # Full-text match + rank in the same query as the filters below
+        queryset = searched.order_by("search_rank", "id")
+        ordering = ("search_rank", "id")
+    elif query:
         queryset = queryset.filter(
             Q(name__icontains=query) |
             Q(description__icontains=query) |
             Q(brand__icontains=query) |
             Q(category__name__icontains=query)
-        )
+        ).distinct()
 
     # 💰 Price filter
     min_price = request.GET.get('min_price')
@@ -148,11 +254,22 @@ def search_products(request):
     if category:
         queryset = queryset.filter(category__slug=category)
 
-    # 🔁 Remove duplicates
-    queryset = queryset.distinct()
+    return product_list_response(request, queryset, ordering, with_facets=True)
 
-    serializer = ProductSerializer(queryset, many=True, context={'request': request})
-    return Response(serializer.data)
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def autocomplete(request):
+    """
+    Search-as-you-type suggestions (ids / names / slugs only), answered
+    from the in-process prefix index without touching the database.
+    """
+    query = request.query_params.get("q", "")
+    try:
+        limit = max(1, min(int(request.query_params.get("limit", 5)), 20))
+    except (TypeError, ValueError):
+        limit = 5
+    return Response(autocomplete_index.suggest(query, limit=limit))
 
 
 # ============================================================
@@ -174,6 +291,8 @@ def add_item(request):
 
         if not product_id:
             return Response({"error": "Product ID is required"}, status=400)
+        if quantity < 1:
+            return Response({"error": "Quantity must be at least 1"}, status=400)
 
         # ✅ Auto-generate a cart_code if not provided
         if not cart_code:
@@ -188,19 +307,11 @@ def add_item(request):
         # ✅ Get product
         product = get_object_or_404(Product, id=product_id)
 
-        # ✅ Add or update cart item
-        size = request.data.get("size")  # 👈 READ SIZE FROM API
-
-        cartitem, created = CartItem.objects.get_or_create(
-         cart=cart,
-         product=product,
-         size=size  # 👈 IMPORTANT
-          )
-        if created:
-            cartitem.quantity = quantity
-        else:
-            cartitem.quantity += quantity
-        cartitem.save()
+        # ✅ Add or increment in one atomic statement (safe under double taps)
+        size = carts.normalise_size(request.data.get("size"))  # 👈 READ SIZE FROM API
+        item_id, total = carts.add_to_cart(cart.pk, product.pk, quantity, size)
+        carts.invalidate_summary(cart)
+        cartitem = CartItem(id=item_id, cart=cart, product=product, size=size, quantity=total)
 
         serializer = CartItemSerializer(cartitem, context={"request": request})
         return Response({
@@ -213,6 +324,42 @@ def add_item(request):
         return Response({"error": str(e)}, status=400)
 
 
+# ------------------------
+# 📦 Batch cart changes
+# ------------------------
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def cart_batch(request):
+    """
+    Several cart changes in one request and one transaction:
+    {"cart_code": "...", "operations": [
+        {"op": "add", "product_id": 1, "quantity": 2, "size": "M"},
+        {"op": "set", "product_id": 2, "quantity": 5},
+        {"op": "remove", "product_id": 3, "size": "L"}]}
+    Returns the updated cart.
+    """
+    if not isinstance(request.data, dict):
+        return Response({"error": "Request body must be an object"}, status=400)
+    # Validated before the cart is resolved, so a bad batch never creates one
+    try:
+        changes = carts.parse_operations(request.data.get("operations"))
+    except carts.InvalidOperation as e:
+        return Response({"error": str(e)}, status=400)
+
+    cart_code = request.data.get("cart_code") or get_random_string(length=10)
+    if request.user.is_authenticated:
+        cart, _ = Cart.objects.get_or_create(user=request.user, paid=False)
+    else:
+        cart, _ = Cart.objects.get_or_create(cart_code=cart_code, paid=False)
+
+    carts.apply_operations(cart, changes)
+
+    cart = Cart.objects.with_totals().get(pk=cart.pk)
+    prefetch_related_objects([cart], *product_prefetch("items__product"))
+    serializer = CartSerializer(cart, context={"request": request})
+    return Response(serializer.data)
+
+
 # ------------------------
 # 🧾 Check if product is in cart
 # ------------------------
@@ -225,9 +372,11 @@ def product_in_cart(request):
     if not cart_code or not product_id:
         return Response({"error": "cart_code and product_id are required"}, status=400)
 
-    cart = get_object_or_404(Cart, cart_code=cart_code)
     product = get_object_or_404(Product, id=product_id)
-    exists = CartItem.objects.filter(cart=cart, product=product).exists()
+    cart = Cart.objects.filter(cart_code=cart_code).first()
+    if cart is None and not carts.deferred_guest_carts():
+        raise Http404("No Cart matches the given query.")
+    exists = cart is not None and CartItem.objects.filter(cart=cart, product=product).exists()
 
     return Response({'product_in_cart': exists})
 
@@ -239,11 +388,34 @@ def product_in_cart(request):
 @permission_classes([AllowAny])
 def get_cart_stat(request):
     cart_code = request.query_params.get("cart_code")
-    cart = get_object_or_404(Cart, cart_code=cart_code)
+    cart = Cart.objects.with_totals().filter(cart_code=cart_code).first() if cart_code else None
+    if cart is None:
+        # A deferred guest cart has no row until its first item
+        if cart_code and carts.deferred_guest_carts():
+            return Response(carts.empty_cart_data(cart_code))
+        raise Http404("No Cart matches the given query.")
+    prefetch_related_objects([cart], *product_prefetch("items__product"))
     serializer = CartSerializer(cart)
     return Response(serializer.data)
 
 
+# ------------------------
+# 🔢 Cart badge (count + total, cached)
+# ------------------------
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def cart_summary(request):
+    """Item count and total for the header badge, without serializing the cart."""
+    if request.user.is_authenticated:
+        summary = carts.cart_summary(user=request.user)
+    else:
+        cart_code = request.query_params.get("cart_code") or request.COOKIES.get("cart_code")
+        if not cart_code:
+            return Response({"error": "cart_code is required"}, status=400)
+        summary = carts.cart_summary(cart_code=cart_code)
+    return Response(summary)
+
+
 # ------------------------
 # 🛍️ Get Full Cart
 # ------------------------
@@ -253,30 +425,38 @@ def get_cart(request):
     """
     Always returns a valid cart (auto-creates one if missing).
     Works for both guests (cart_code) and logged-in users.
+    Guest carts are only written once something is added to them
+    (GUEST_CART_STORAGE = "deferred").
     """
     user = request.user if request.user.is_authenticated else None
 
     # ✅ For logged-in users
     if user:
-        cart, created = Cart.objects.get_or_create(user=user, paid=False)
+        cart, created = Cart.objects.with_totals().get_or_create(user=user, paid=False)
 
     else:
         # ✅ For guest users
         cart_code = request.query_params.get("cart_code") or request.COOKIES.get("cart_code")
 
-        if not cart_code:
+        if carts.deferred_guest_carts():
+            cart, cart_code = carts.find_guest_cart(cart_code)
+        elif not cart_code:
             # generate a random cart_code
             cart_code = get_random_string(length=10)
             cart = Cart.objects.create(cart_code=cart_code)
         else:
-            cart, created = Cart.objects.get_or_create(cart_code=cart_code, paid=False)
+            cart, created = Cart.objects.with_totals().get_or_create(cart_code=cart_code, paid=False)
 
-    serializer = CartSerializer(cart, context={'request': request})
-    response = Response(serializer.data)
+    if cart is None:
+        response = Response(carts.empty_cart_data(cart_code))
+    else:
+        prefetch_related_objects([cart], *product_prefetch("items__product"))
+        serializer = CartSerializer(cart, context={'request': request})
+        response = Response(serializer.data)
 
     # ✅ Save cart_code for guest in cookies (optional)
     if not user:
-        response.set_cookie("cart_code", cart.cart_code, max_age=7*24*3600)  # 1 week
+        response.set_cookie("cart_code", cart_code, max_age=7*24*3600)  # 1 week
 
     return response
 
@@ -291,14 +471,16 @@ def update_quantity(request):
     try:
         item_id = request.data.get("item_id")
         quantity = int(request.data.get("quantity", 1))
-        cartitem = get_object_or_404(CartItem, id=item_id)
+        cartitem = get_object_or_404(CartItem.objects.select_related("cart"), id=item_id)
 
         if quantity <= 0:
             cartitem.delete()
+            carts.invalidate_summary(cartitem.cart)
             return Response({"message": "Item removed"}, status=204)
 
         cartitem.quantity = quantity
         cartitem.save()
+        carts.invalidate_summary(cartitem.cart)
         serializer = CartItemSerializer(cartitem, context={"request": request})
         return Response({"data": serializer.data, "message": "Quantity updated"}, status=200)
 
@@ -313,8 +495,9 @@ def update_quantity(request):
 @permission_classes([AllowAny])
 def delete_cartitem(request):
     item_id = request.data.get("item_id")
-    cartitem = get_object_or_404(CartItem, id=item_id)
+    cartitem = get_object_or_404(CartItem.objects.select_related("cart"), id=item_id)
     cartitem.delete()
+    carts.invalidate_summary(cartitem.cart)
     return Response({"message": "Item deleted successfully"}, status=204)
 
 
@@ -325,7 +508,7 @@ def delete_cartitem(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_wishlist(request):
-    wishlist = Wishlist.objects.filter(user=request.user)
+    wishlist = Wishlist.objects.filter(user=request.user).prefetch_related(*product_prefetch("product"))
     serializer = WishlistSerializer(wishlist, many=True, context={'request': request})
     return Response(serializer.data)
 
@@ -358,18 +541,24 @@ def remove_from_wishlist(request, product_id):
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@conditional(lambda request: queryset_validators(
+    trending.trending_queryset(), "updated_at", "trending_score__updated_at"
+))
 def trending_products(request):
-    items = Product.objects.filter(is_trending=True)
-    serializer = ProductSerializer(items, many=True, context={'request': request})
-    return Response(serializer.data)
+    """
+    Top products by time-decayed orders / wishlist / cart activity
+    (products/trending.py), with admin-flagged ones pinned first.
+    """
+    items = trending.trending_queryset().order_by(*trending.TRENDING_ORDERING)
+    return product_list_response(request, items, trending.TRENDING_ORDERING)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
+@conditional(lambda request: queryset_validators(Product.objects.filter(is_top_deal=True)))
 def top_deals_products(request):
     items = Product.objects.filter(is_top_deal=True)
-    serializer = ProductSerializer(items, many=True, context={'request': request})
-    return Response(serializer.data)
+    return product_list_response(request, items)
 
 
 
@@ -381,9 +570,9 @@ def top_deals_products(request):
 def create_order(request):
     try:
         user = request.user
-        cart = Cart.objects.filter(user=user, paid=False).first()
+        cart = Cart.objects.with_totals().filter(user=user, paid=False).first()
 
-        if not cart or not cart.items.exists():
+        if not cart or not cart.total_items:
             return Response({"error": "Your cart is empty."}, status=400)
 
         # =========================
@@ -498,7 +687,7 @@ def verify_payment(request):
         if not payment:
             return Response({"error": "Payment not found"}, status=404)
 
-        cart = payment.cart
+        cart = Cart.objects.with_totals().get(pk=payment.cart_id)
 
         # 🔐 Security check
         if cart.user != request.user:
@@ -526,7 +715,7 @@ def verify_payment(request):
             address=address   # ✅ DELIVERY ADDRESS SAVED
         )
 
-        for item in cart.items.all():
+        for item in cart.items.select_related("product"):
             OrderItem.objects.create(
                 order=order,
                 product=item.product,
@@ -539,6 +728,13 @@ def verify_payment(request):
         cart.items.all().delete()
         cart.paid = True
         cart.save()
+        carts.invalidate_summary(cart)
+
+        # 5️⃣ Frequently-bought-together counts (never fails the payment)
+        try:
+            cooccurrence.record_order(order)
+        except Exception:
+            logger.exception("Co-occurrence update failed for order %s", order.pk)
 
         return Response({"message": "Payment verified successfully"}, status=200)
 
@@ -560,6 +756,11 @@ from .serializers import OrderSerializer
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_user_orders(request):
-    orders = Order.objects.filter(user=request.user).order_by("-created_at")
+    orders = (
+        Order.objects.filter(user=request.user)
+        .select_related("address")
+        .prefetch_related(*product_prefetch("items__product"))
+        .order_by("-created_at")
+    )
     serializer = OrderSerializer(orders, many=True)
     return Response(serializer.data)